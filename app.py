@@ -1,16 +1,124 @@
+import importlib
+import json
 import os
-from dotenv import load_dotenv
+from datetime import datetime
 
-# Carrega variáveis do arquivo .env (caminho explícito para funcionar no WSGI)
-basedir = os.path.dirname(os.path.abspath(__file__))
-load_dotenv(os.path.join(basedir, '.env'))
+# Importar config primeiro: carrega o .env (uma vez por processo) antes das extensões
+from config import Config, basedir, carregar_env
 
-from flask import Flask, redirect, url_for, render_template
+import click
+from flask import Flask, current_app, g, redirect, request, url_for, render_template
 from flask_login import LoginManager, login_required, current_user
-from config import Config
 from models import db, User, Category, SLAConfig, SLACliente, IndicadorCategoria, Indicador, Cliente
 
+# Blueprints registrados na aplicação: (módulo, atributo)
+BLUEPRINTS = [
+    ('routes.auth', 'auth_bp'),
+    ('routes.tickets', 'tickets_bp'),
+    ('routes.users', 'users_bp'),
+    ('routes.dashboard', 'dashboard_bp'),
+    ('routes.reports', 'reports_bp'),
+    ('routes.auditoria', 'auditoria_bp'),
+    ('routes.clientes', 'clientes_bp'),
+    ('routes.indicadores', 'indicadores_bp'),
+    ('routes.roteirizador', 'roteirizador_bp'),
+    ('routes.veiculos', 'veiculos_bp'),
+    ('routes.passageiros', 'passageiros_bp'),
+]
+
+
+def _registrar_blueprints(app):
+    """Importa os módulos de rotas sob demanda e registra seus blueprints"""
+    for modulo, atributo in BLUEPRINTS:
+        app.register_blueprint(getattr(importlib.import_module(modulo), atributo))
+
+
+# Bits de permissão do usuário, combinados em g.permissoes uma vez por requisição
+PERM_ADMIN = 1
+PERM_GESTOR = 2
+PERM_AUDITORIA = 4
+PERM_COMBUSTIVEL = 8
+PERM_INDICADORES = 16
+PERM_ROTEIRIZADOR = 32
+
+# Categorias que liberam módulos
+PERMISSOES_CATEGORIA = {
+    'Auditoria': PERM_AUDITORIA,
+    'Análise de Combustível': PERM_COMBUSTIVEL,
+    'Indicadores Diretoria': PERM_INDICADORES,
+    'Roteirizador': PERM_ROTEIRIZADOR,
+}
+
+# Módulos da página inicial: (chave, nome, descrição, ícone, cor, endpoint, permissões)
+# Permissões 0 = todos os usuários; senão basta ter um dos bits
+MODULOS = (
+    ('atendimento', 'Atendimento', 'Central de chamados, tickets e suporte ao cliente.',
+     'bi-headset', '#00a8e8', 'dashboard.index', 0),
+    ('relatorios', 'Relatórios', 'Relatórios gerenciais e exportação de dados.',
+     'bi-file-earmark-bar-graph', '#198754', 'reports.index', 0),
+    ('auditoria', 'Auditoria de Rotas', 'Auditoria de rotas planejadas vs. executadas com análise KML.',
+     'bi-signpost-2', '#6f42c1', 'auditoria.lista_rotas', PERM_ADMIN | PERM_AUDITORIA),
+    ('combustivel', 'Combustível', 'Análise de consumo de combustível e detecção de anomalias.',
+     'bi-fuel-pump', '#fd7e14', 'auditoria.combustivel', PERM_ADMIN | PERM_COMBUSTIVEL),
+    ('clientes', 'Clientes', 'Cadastro e gerenciamento de empresas clientes.',
+     'bi-building', '#0d6efd', 'clientes.lista', PERM_ADMIN | PERM_AUDITORIA | PERM_COMBUSTIVEL),
+    ('indicadores', 'Indicadores Diretoria', 'Indicadores gerenciais e acompanhamento mensal pela diretoria.',
+     'bi-graph-up-arrow', '#dc3545', 'indicadores.painel', PERM_ADMIN | PERM_INDICADORES),
+    ('roteirizador', 'Roteirizador Inteligente',
+     'Planejamento inteligente de rotas de fretamento com otimização de paradas.',
+     'bi-map', '#20c997', 'roteirizador.lista', PERM_ADMIN | PERM_ROTEIRIZADOR),
+    ('usuarios', 'Gestão de Usuários', 'Gerenciamento de usuários, categorias e configurações do sistema.',
+     'bi-people', '#58595b', 'users.lista', PERM_ADMIN | PERM_GESTOR),
+)
+
+
+# Endpoints sem argumentos usados no menu lateral e na página inicial
+ENDPOINTS_MENU = (
+    'index', 'dashboard.index', 'tickets.lista', 'reports.index', 'users.sla_config',
+    'clientes.lista', 'auditoria.lista_rotas', 'auditoria.combustivel', 'roteirizador.lista',
+    'passageiros.lista', 'veiculos.lista', 'indicadores.painel', 'users.lista',
+    'users.categorias', 'auth.perfil', 'auth.logout',
+)
+
+
+def _montar_urls_menu(app):
+    """Resolve uma vez as URLs dos endpoints do menu"""
+    with app.test_request_context():
+        return {endpoint: url_for(endpoint) for endpoint in ENDPOINTS_MENU}
+
+
+def _montar_modulos(urls):
+    """Monta a lista de módulos da página inicial com as URLs já resolvidas"""
+    return [
+        {'chave': chave, 'nome': nome, 'descricao': descricao,
+         'icone': icone, 'cor': cor, 'url': urls[endpoint], 'permissoes': permissoes}
+        for chave, nome, descricao, icone, cor, endpoint, permissoes in MODULOS
+    ]
+
+
+# Login manager no nível do módulo (como o db em models), configurado por app em create_app
+login_manager = LoginManager()
+login_manager.login_view = 'auth.login'
+login_manager.login_message = 'Por favor, faça login para acessar esta página.'
+login_manager.login_message_category = 'warning'
+
+
+@login_manager.user_loader
+def load_user(user_id):
+    # Reaproveita o usuário já carregado nesta requisição (g é por requisição)
+    user_id = int(user_id)
+    user = g.get('_usuario_carregado')
+    if user is None or user.id != user_id:
+        # Usuário e categorias em um único JOIN; as checagens de permissão
+        # da requisição usam a coleção já carregada
+        user = db.session.get(User, user_id, options=[db.joinedload(User.categorias)])
+        g._usuario_carregado = user
+        g.cat_names = {c.nome for c in user.categorias} if user else set()
+    return user
+
+
 def create_app():
+    carregar_env()
     app = Flask(__name__)
     app.config.from_object(Config)
 
@@ -19,41 +127,7 @@ def create_app():
 
     # Inicializar extensões
     db.init_app(app)
-
-    login_manager = LoginManager()
     login_manager.init_app(app)
-    login_manager.login_view = 'auth.login'
-    login_manager.login_message = 'Por favor, faça login para acessar esta página.'
-    login_manager.login_message_category = 'warning'
-
-    @login_manager.user_loader
-    def load_user(user_id):
-        return User.query.get(int(user_id))
-
-    # Registrar blueprints
-    from routes.auth import auth_bp
-    from routes.tickets import tickets_bp
-    from routes.users import users_bp
-    from routes.dashboard import dashboard_bp
-    from routes.reports import reports_bp
-    from routes.auditoria import auditoria_bp
-    from routes.clientes import clientes_bp
-    from routes.indicadores import indicadores_bp
-    from routes.roteirizador import roteirizador_bp
-    from routes.veiculos import veiculos_bp
-    from routes.passageiros import passageiros_bp
-
-    app.register_blueprint(auth_bp)
-    app.register_blueprint(tickets_bp)
-    app.register_blueprint(users_bp)
-    app.register_blueprint(dashboard_bp)
-    app.register_blueprint(reports_bp)
-    app.register_blueprint(auditoria_bp)
-    app.register_blueprint(clientes_bp)
-    app.register_blueprint(indicadores_bp)
-    app.register_blueprint(roteirizador_bp)
-    app.register_blueprint(veiculos_bp)
-    app.register_blueprint(passageiros_bp)
 
     # Endpoint de deploy - git pull via API
     @app.route('/deploy-hook', methods=['POST'])
@@ -77,138 +151,163 @@ def create_app():
         except Exception as e:
             return jsonify({'ok': False, 'msg': str(e)}), 500
 
+    # Permissões do usuário calculadas uma vez por requisição (também usadas no base.html)
+    @app.before_request
+    def carregar_permissoes():
+        if request.endpoint == 'static' or not current_user.is_authenticated:
+            return
+        g.is_admin = current_user.is_admin()
+        g.is_gestor = current_user.is_gestor()
+        if 'cat_names' not in g:
+            g.cat_names = {c.nome for c in current_user.categorias}
+        permissoes = (PERM_ADMIN if g.is_admin else 0) | (PERM_GESTOR if g.is_gestor else 0)
+        for nome in g.cat_names:
+            permissoes |= PERMISSOES_CATEGORIA.get(nome, 0)
+        g.permissoes = permissoes
+
     # Rota raiz - Página de módulos
     @app.route('/')
     @login_required
     def index():
         modulos = []
-
-        # Atendimento - todos os usuários
-        modulos.append({
-            'nome': 'Atendimento',
-            'descricao': 'Central de chamados, tickets e suporte ao cliente.',
-            'icone': 'bi-headset',
-            'cor': '#00a8e8',
-            'url': url_for('dashboard.index')
-        })
-
-        # Relatórios - todos os usuários
-        modulos.append({
-            'nome': 'Relatórios',
-            'descricao': 'Relatórios gerenciais e exportação de dados.',
-            'icone': 'bi-file-earmark-bar-graph',
-            'cor': '#198754',
-            'url': url_for('reports.index')
-        })
-
-        # Auditoria de Rotas - admin + categoria Auditoria
-        tem_auditoria = current_user.is_admin() or \
-            current_user.categorias.filter_by(nome='Auditoria').first()
-
-        # Combustível - admin + categoria Análise de Combustível
-        tem_combustivel = current_user.is_admin() or \
-            current_user.categorias.filter_by(nome='Análise de Combustível').first()
-
-        if tem_auditoria:
-            modulos.append({
-                'nome': 'Auditoria de Rotas',
-                'descricao': 'Auditoria de rotas planejadas vs. executadas com análise KML.',
-                'icone': 'bi-signpost-2',
-                'cor': '#6f42c1',
-                'url': url_for('auditoria.lista_rotas')
-            })
-
-        if tem_combustivel:
-            modulos.append({
-                'nome': 'Combustível',
-                'descricao': 'Análise de consumo de combustível e detecção de anomalias.',
-                'icone': 'bi-fuel-pump',
-                'cor': '#fd7e14',
-                'url': url_for('auditoria.combustivel')
-            })
-
-        # Clientes - admin + auditoria ou combustível
-        if current_user.is_admin() or tem_auditoria or tem_combustivel:
-            modulos.append({
-                'nome': 'Clientes',
-                'descricao': 'Cadastro e gerenciamento de empresas clientes.',
-                'icone': 'bi-building',
-                'cor': '#0d6efd',
-                'url': url_for('clientes.lista')
-            })
-
-        # Indicadores Diretoria
-        tem_indicadores = current_user.is_admin() or \
-            current_user.categorias.filter_by(nome='Indicadores Diretoria').first()
-
-        if tem_indicadores:
-            modulos.append({
-                'nome': 'Indicadores Diretoria',
-                'descricao': 'Indicadores gerenciais e acompanhamento mensal pela diretoria.',
-                'icone': 'bi-graph-up-arrow',
-                'cor': '#dc3545',
-                'url': url_for('indicadores.painel')
-            })
-
-        # Roteirizador Inteligente
-        tem_roteirizador = current_user.is_admin() or \
-            current_user.categorias.filter_by(nome='Roteirizador').first()
-
-        if tem_roteirizador:
-            modulos.append({
-                'nome': 'Roteirizador Inteligente',
-                'descricao': 'Planejamento inteligente de rotas de fretamento com otimização de paradas.',
-                'icone': 'bi-map',
-                'cor': '#20c997',
-                'url': url_for('roteirizador.lista')
-            })
-
-        # Administração - admin e gestor
-        if current_user.is_admin() or current_user.is_gestor():
-            modulos.append({
-                'nome': 'Gestão de Usuários',
-                'descricao': 'Gerenciamento de usuários' + (', categorias e configurações do sistema.' if current_user.is_admin() else ' das suas categorias.'),
-                'icone': 'bi-people',
-                'cor': '#58595b',
-                'url': url_for('users.lista')
-            })
+        for modulo in app.config['MODULOS']:
+            if modulo['permissoes'] and not modulo['permissoes'] & g.permissoes:
+                continue
+            if modulo['chave'] == 'usuarios' and not g.is_admin:
+                modulo = dict(modulo, descricao='Gerenciamento de usuários das suas categorias.')
+            modulos.append(modulo)
 
         return render_template('modulos.html', modulos=modulos)
 
     # Context processor para templates
     @app.context_processor
     def utility_processor():
-        from datetime import datetime
         return {
             'now': datetime.utcnow()
         }
 
-    # Criar tabelas e dados iniciais
+    # Criar tabelas e dados iniciais (idempotente; com a base em dia, o
+    # custo é a leitura do catálogo e a consulta de situação dos dados iniciais)
+    inicializar_banco(app)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Cria as tabelas, aplica as migrations simples e os dados iniciais"""
+        inicializar_banco(app)
+        click.echo('Base de dados inicializada.')
+
+    # Registrar blueprints (após a inicialização do banco, que não depende das rotas)
+    _registrar_blueprints(app)
+
+    # URLs do menu e dos módulos não mudam após o registro dos blueprints
+    app.config['MODULE_URLS'] = _montar_urls_menu(app)
+    app.config['MODULOS'] = _montar_modulos(app.config['MODULE_URLS'])
+
+    return app
+
+
+# Dados iniciais: (prioridade, horas de resposta, horas de resolução)
+SLA_PADRAO = (
+    ('critica', 1, 4),
+    ('alta', 2, 8),
+    ('media', 4, 24),
+    ('baixa', 8, 48),
+)
+
+# Categorias padrão: (nome, descrição)
+CATEGORIAS_PADRAO = (
+    ('Solicitação Geral', 'Solicitações gerais e dúvidas'),
+    ('Atendimento', 'Atendimento ao cliente'),
+    ('Serviços', 'Solicitações de serviços'),
+    ('Informações', 'Solicitações de informações'),
+    ('Sugestões', 'Sugestões e melhorias'),
+    ('Outros', 'Outros assuntos'),
+    ('Auditoria', 'Acesso ao módulo de auditoria de rotas'),
+    ('Análise de Combustível', 'Acesso ao módulo de análise de combustível'),
+    ('Indicadores Diretoria', 'Acesso ao módulo de indicadores gerenciais'),
+    ('Roteirizador', 'Acesso ao módulo de roteirização inteligente'),
+)
+
+# Indicadores padrão ficam em JSON e só são lidos quando a tabela está vazia
+INDICADORES_PADRAO_PATH = os.path.join(basedir, 'seed', 'indicadores_padrao.json')
+
+
+def carregar_indicadores_padrao():
+    """Lê os indicadores padrão agrupados por categoria"""
+    with open(INDICADORES_PADRAO_PATH, encoding='utf-8') as f:
+        return json.load(f)
+
+
+def situacao_dados_iniciais():
+    """
+    Verifica em uma única consulta o que já existe dos dados iniciais.
+    Retorna (admin_existe, total_slas, total_categorias, indicadores_existem).
+    """
+    return db.session.query(
+        db.session.query(User.id).filter_by(email='admin@helpdesk.com').exists(),
+        db.session.query(db.func.count(SLAConfig.id)).filter(
+            SLAConfig.prioridade.in_([p for p, _, _ in SLA_PADRAO])
+        ).scalar_subquery(),
+        db.session.query(db.func.count(Category.id)).filter(
+            Category.nome.in_([n for n, _ in CATEGORIAS_PADRAO])
+        ).scalar_subquery(),
+        db.session.query(IndicadorCategoria.id).exists(),
+    ).one()
+
+
+# Colunas adicionadas em tabelas existentes: (tabela, coluna, tipo)
+COLUNAS_MIGRADAS = (
+    ('roteirizacoes', 'progresso_json', 'TEXT'),
+    ('users', 'cliente_id', 'INTEGER REFERENCES clientes(id)'),
+)
+
+
+def colunas_pendentes():
+    """
+    Lê o catálogo uma vez e retorna as colunas de COLUNAS_MIGRADAS ausentes,
+    ou None se alguma tabela dos models ainda não existe.
+    """
+    inspetor = db.inspect(db.engine)
+    if not set(inspetor.get_table_names()).issuperset(db.metadata.tables):
+        return None
+    colunas = {}
+    pendentes = []
+    for tabela, coluna, tipo in COLUNAS_MIGRADAS:
+        if tabela not in colunas:
+            colunas[tabela] = {c['name'] for c in inspetor.get_columns(tabela)}
+        if coluna not in colunas[tabela]:
+            pendentes.append((tabela, coluna, tipo))
+    return pendentes
+
+
+def inicializar_banco(app):
+    """Cria tabelas, aplica migrations seguras e popula dados iniciais"""
     with app.app_context():
-        db.create_all()
-        # Migration segura: adicionar progresso_json se não existir
-        try:
-            db.session.execute(db.text("SELECT progresso_json FROM roteirizacoes LIMIT 1"))
-        except Exception:
-            db.session.rollback()
-            db.session.execute(db.text("ALTER TABLE roteirizacoes ADD COLUMN progresso_json TEXT"))
-            db.session.commit()
-        # Migration segura: adicionar cliente_id em users
-        try:
-            db.session.execute(db.text("SELECT cliente_id FROM users LIMIT 1"))
-        except Exception:
-            db.session.rollback()
-            db.session.execute(db.text("ALTER TABLE users ADD COLUMN cliente_id INTEGER REFERENCES clientes(id)"))
+        pendentes = colunas_pendentes()
+        # Tabela nova: create_all cria a tabela (com seus índices) e as
+        # colunas são relidas depois dela
+        if pendentes is None:
+            db.create_all()
+            pendentes = colunas_pendentes()
+        for tabela, coluna, tipo in pendentes:
+            db.session.execute(db.text(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}'))
             db.session.commit()
         init_data()
-
-    return app
+        backfill_cliente_id()
 
 
 def init_data():
     """Cria dados iniciais se não existirem"""
+    admin_existe, total_slas, total_categorias, indicadores_existem = situacao_dados_iniciais()
+    slas_completos = total_slas == len(SLA_PADRAO)
+    categorias_completas = total_categorias == len(CATEGORIAS_PADRAO)
+
+    # Base já populada: nenhuma outra consulta é necessária
+    if admin_existe and slas_completos and categorias_completas and indicadores_existem:
+        return
+
     # Criar admin se não existir
-    if not User.query.filter_by(email='admin@helpdesk.com').first():
+    if not admin_existe:
         admin = User(
             nome='Administrador',
             email='admin@helpdesk.com',
@@ -216,100 +315,58 @@ def init_data():
         )
         admin.set_senha('admin123')
         db.session.add(admin)
-        print('Usuário admin criado: admin@helpdesk.com / admin123')
+        current_app.logger.warning('Usuário admin padrão criado (%s); altere a senha padrão.',
+                                   'admin@helpdesk.com')
 
     # Criar configurações de SLA
-    sla_defaults = [
-        ('critica', 1, 4),
-        ('alta', 2, 8),
-        ('media', 4, 24),
-        ('baixa', 8, 48)
-    ]
-    for prioridade, resposta, resolucao in sla_defaults:
-        if not SLAConfig.query.filter_by(prioridade=prioridade).first():
-            sla = SLAConfig(
-                prioridade=prioridade,
-                tempo_resposta_horas=resposta,
-                tempo_resolucao_horas=resolucao
-            )
-            db.session.add(sla)
+    if not slas_completos:
+        prioridades_existentes = {p for (p,) in db.session.query(SLAConfig.prioridade).filter(
+            SLAConfig.prioridade.in_([p for p, _, _ in SLA_PADRAO]))}
+        db.session.bulk_insert_mappings(SLAConfig, [
+            {'prioridade': prioridade, 'tempo_resposta_horas': resposta,
+             'tempo_resolucao_horas': resolucao}
+            for prioridade, resposta, resolucao in SLA_PADRAO
+            if prioridade not in prioridades_existentes
+        ])
+        # bulk_insert_mappings não dispara os eventos do mapper
+        SLAConfig.invalidar_cache()
 
     # Criar categorias padrão
-    categorias_padrao = [
-        ('Solicitação Geral', 'Solicitações gerais e dúvidas'),
-        ('Atendimento', 'Atendimento ao cliente'),
-        ('Serviços', 'Solicitações de serviços'),
-        ('Informações', 'Solicitações de informações'),
-        ('Sugestões', 'Sugestões e melhorias'),
-        ('Outros', 'Outros assuntos'),
-        ('Auditoria', 'Acesso ao módulo de auditoria de rotas'),
-        ('Análise de Combustível', 'Acesso ao módulo de análise de combustível'),
-        ('Indicadores Diretoria', 'Acesso ao módulo de indicadores gerenciais'),
-        ('Roteirizador', 'Acesso ao módulo de roteirização inteligente')
-    ]
-    for nome, descricao in categorias_padrao:
-        if not Category.query.filter_by(nome=nome).first():
-            cat = Category(nome=nome, descricao=descricao)
-            db.session.add(cat)
-
-    # Criar indicadores padrão
-    if not IndicadorCategoria.query.first():
-        indicadores_padrao = [
-            ('CONSUMO', [
-                ('Pneus', 'Km 1ª Vida e Reformas das medidas 275 e 215, 295, Custo Por Km para as unidades (BH, Anglo e Lafaiete)', 'Victor Maffia', 'Christiane Henriques'),
-                ('Combustível', 'Média Geral de Consumo - ROUXINOL e SUDOESTINO', 'Victor Maffia', ''),
-            ]),
-            ('MECÂNICA', [
-                ('Socorros e Atrasos por Companhia', 'Quantidade de socorros e de atrasos ocorridos por companhia (responsável: Rouxinol ou não) - Estratificar motivos', 'Leandro Oliveira', ''),
-            ]),
-            ('MANUTENÇÃO VISUAL', [
-                ('Reparos identificados', 'Quantidade de reparos total X Quantidade de reparos com identificação do responsável', 'Oziel Carvalho', ''),
-                ('Reforma geral', 'Quantidade de veículos reformados no mês', 'Oziel Carvalho', ''),
-            ]),
-            ('EFICIÊNCIA NA ESCALA', [
-                ('Redução de KM Improdutivo', 'Kms improdutivos reduzidos no mês', 'Renata / Wesley', ''),
-                ('Implantação de Duplas', 'Implantação de duplas de motoristas', 'Renata / Wesley', ''),
-                ('Jornada de descanso 11 horas', 'Quantidade de colaboradores dentro do padrão de 11 horas de descanso', 'Renata / Wesley', ''),
-                ('Horas Extras', 'Redução das horas extras realizadas', 'Renata / Wesley', ''),
-            ]),
-            ('RECURSOS HUMANOS', [
-                ('Absenteísmo', 'Quantidade por setor', 'Jessica Custódio', 'Liwshanna Oliveira'),
-                ('Turnover', 'Número real de colaboradores do setor/contratados/demitidos', 'Jessica Custódio', ''),
-            ]),
-            ('DEPTO PESSOAL', [
-                ('Atestados', 'Número total / número por setor', 'Jorgeane Reis', ''),
-            ]),
-            ('COMPRAS E ESTOQUE', [
-                ('Eficiência na compra', 'Evolução dos custos de aquisição, preço médio, curva ABC, quantidades, etc', 'Adeilson Martins', 'Simone Thais'),
-                ('Compras com cercas limites e através de autorizações', 'Analisar compras fora do limite (alçada)', 'Adeilson Martins', ''),
-            ]),
-        ]
-        for ordem_cat, (cat_nome, indicadores) in enumerate(indicadores_padrao):
-            cat = IndicadorCategoria(nome=cat_nome, ordem=ordem_cat)
-            db.session.add(cat)
-            db.session.flush()
-            for ordem_ind, (ind_nome, ind_desc, resp_ger, resp_conf) in enumerate(indicadores):
-                ind = Indicador(
-                    categoria_id=cat.id,
-                    nome=ind_nome,
-                    descricao=ind_desc,
-                    responsavel_geracao=resp_ger,
-                    responsavel_conferencia=resp_conf,
-                    ordem=ordem_ind
-                )
-                db.session.add(ind)
+    if not categorias_completas:
+        categorias_existentes = {nome for (nome,) in db.session.query(Category.nome).filter(
+            Category.nome.in_([n for n, _ in CATEGORIAS_PADRAO]))}
+        db.session.bulk_insert_mappings(Category, [
+            {'nome': nome, 'descricao': descricao}
+            for nome, descricao in CATEGORIAS_PADRAO
+            if nome not in categorias_existentes
+        ])
+
+    # Criar indicadores padrão (um flush para obter os ids das categorias)
+    if not indicadores_existem:
+        indicadores_padrao = carregar_indicadores_padrao()
+        categorias_ind = [IndicadorCategoria(nome=grupo['categoria'], ordem=ordem_cat)
+                          for ordem_cat, grupo in enumerate(indicadores_padrao)]
+        db.session.add_all(categorias_ind)
+        db.session.flush()
+        db.session.bulk_insert_mappings(Indicador, [
+            dict(indicador, categoria_id=cat.id, ordem=ordem_ind)
+            for cat, grupo in zip(categorias_ind, indicadores_padrao)
+            for ordem_ind, indicador in enumerate(grupo['indicadores'])
+        ])
 
     db.session.commit()
 
-    # Backfill: popular cliente_id para users que já têm empresa
+
+def backfill_cliente_id():
+    """Popula cliente_id para users que já têm empresa"""
     users_sem_cliente_id = User.query.filter(
         User.empresa.isnot(None), User.empresa != '',
         User.cliente_id.is_(None)
     ).all()
     for user in users_sem_cliente_id:
-        cliente = Cliente.query.filter_by(nome=user.empresa).first()
-        if cliente:
-            user.cliente_id = cliente.id
+        cliente_id = db.session.query(Cliente.id).filter_by(nome=user.empresa).limit(1).scalar()
+        if cliente_id:
+            user.cliente_id = cliente_id
     if users_sem_cliente_id:
         db.session.commit()
 
@@ -1,121 +1,221 @@
 """
 Utilitários para análise de combustível - Parser de arquivos PRAXIO (ABA - Abastecimento/Quilometragem)
 """
+import mmap
 import re
-from datetime import datetime
-from statistics import median
+from collections import defaultdict
+from datetime import date, datetime
+from operator import attrgetter
+from typing import NamedTuple
+
+# Regex (bytes, multilinha) para linhas de dados - começa com prefixo de 7
+# dígitos e termina, opcionalmente, com Garagem + Modelo; o trecho entre os
+# dois guarda a flag *. Espaços não incluem \n para o match não atravessar linhas.
+# Campos vizinhos usam classes disjuntas (dígitos x espaço), então o match não
+# retrocede e falha já no primeiro caractere em linhas de cabeçalho/totais.
+_DATA_LINE_RE = re.compile(
+    rb'^(\d{7})[^\S\n]+'             # Prefixo
+    rb'(\d{2}/\d{2}/\d{4})[^\S\n]+'  # Data
+    rb'(\d{2}:\d{2})[^\S\n]+'        # Hora
+    rb'(\w)[^\S\n]+'                  # Tipo
+    rb'(\d+)[^\S\n]+'                 # Tanque
+    rb'(\d+)[^\S\n]+'                 # Bomba
+    rb'([\d.,]+)[^\S\n]+'             # Combustível (litros)
+    rb'([\d.,]+)[^\S\n]+'             # Hodômetro inicial
+    rb'([\d.,]+)[^\S\n]+'             # Hodômetro final
+    rb'(-?[\d.,]+)[^\S\n]+'           # Km
+    rb'([\d.,]+)[^\S\n]+'             # Km acumulado
+    rb'(-?[\d.,]+)'                   # Km/L
+    rb'(.*?)'                         # Resto (flag *)
+    rb'(?:(\d{3})[^\S\n]+(\d{3}-.+?)[^\S\n]*)?$',  # Garagem + Modelo
+    re.MULTILINE
+)
+_EMPRESA_RE = re.compile(r'Empresa inicial:\s*\d+\s+(.+?)(?:\s{2,}|$)')
+_DATAS_RE = re.compile(r'Datas:\s*(\d{2}/\d{2}/\d{4}).*?a\s+(\d{2}/\d{2}/\d{4})')
+
+# Tabelas para converter 1.234,56 -> 1234.56 numa única passada
+_BR_FLOAT = str.maketrans({'.': None, ',': '.'})
+_BR_FLOAT_BYTES = bytes.maketrans(b',', b'.')
+
+# Tanque/bomba têm 1 a 3 dígitos: consulta em tabela em vez de int() por registro
+_INTEIROS = {str(i).encode(): i for i in range(1000)}
+
+
+# Tipo de alerta -> (severidade, modelo da descrição)
+_ALERTAS = {
+    'KM_INVALIDO': ('alta', 'Km {0:.1f} (zero ou negativo)'),
+    'HODOMETRO_DECRESCENTE': ('alta', 'Hodômetro final ({0:.0f}) menor que inicial ({1:.0f})'),
+    'KML_MUITO_BAIXO': ('alta', 'Km/L {0:.2f} está {1:.0f}% abaixo da mediana do modelo ({2:.2f} Km/L)'),
+    'KML_BAIXO': ('media', 'Km/L {0:.2f} está {1:.0f}% abaixo da mediana do modelo ({2:.2f} Km/L)'),
+    'KML_MUITO_ALTO': ('alta', 'Km/L {0:.2f} está {1:.0f}% acima da mediana do modelo ({2:.2f} Km/L)'),
+    'KML_ALTO': ('media', 'Km/L {0:.2f} está {1:.0f}% acima da mediana do modelo ({2:.2f} Km/L)'),
+    'HODOMETRO_INCONSISTENTE': (
+        'alta', 'Hodômetro inicial ({0:.0f}) menor que o final do abast. anterior ({1:.0f})'
+    ),
+    'FLAG_SISTEMA': ('baixa', 'Marcado pelo sistema PRAXIO (*)'),
+}
+
+
+class RegistroCombustivel(NamedTuple):
+    """Linha de abastecimento do relatório PRAXIO (tupla leve, sem dict por registro)"""
+    prefixo: str
+    data: date
+    hora: str
+    tipo: str
+    tanque: int
+    bomba: int
+    litros: float
+    hodometro_inicio: float
+    hodometro_fim: float
+    km: float
+    km_acumulado: float
+    kml: float
+    flag: str
+    garagem: str
+    modelo: str
 
 
 def parse_float_br(value):
     """Converte float no formato brasileiro (1.234,56) para Python float"""
     if not value or not value.strip():
         return 0.0
-    value = value.strip().replace('.', '').replace(',', '.')
     try:
-        return float(value)
+        return float(value.strip().translate(_BR_FLOAT))
     except ValueError:
         return 0.0
 
 
-def parse_arquivo_combustivel(filepath):
-    """
-    Faz o parse do arquivo TXT do sistema PRAXIO (relatório ABA).
-    Retorna dicionário com empresa, período e lista de registros.
-    """
+def _detectar_encoding(buf):
+    """PRAXIO exporta em latin-1; usa UTF-8 só se a amostra inicial for UTF-8 válido"""
+    amostra = buf[:65536]
+    if amostra.isascii():
+        return 'latin-1'
+    try:
+        amostra.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Erro só nos últimos bytes = caractere cortado pelo fim da amostra
+        if e.start < len(amostra) - 3:
+            return 'latin-1'
+    return 'utf-8'
+
+
+def _linha_cabecalho(buf, marcador, fim_cabecalho, encoding):
+    """Retorna (decodificada) a primeira linha do cabeçalho que contém o marcador"""
+    pos = buf.find(marcador, 0, fim_cabecalho)
+    if pos < 0:
+        return None
+    inicio = buf.rfind(b'\n', 0, pos) + 1
+    fim = buf.find(b'\n', pos)
+    return buf[inicio:fim if fim >= 0 else len(buf)].decode(encoding, 'replace').rstrip('\r')
+
+
+def _parse_registros(buf, encoding):
+    """Extrai os registros das linhas de dados de um buffer (bytes/mmap)"""
     registros = []
+    datas = {}  # cache de strptime: poucas datas distintas se repetem no arquivo
+    inteiro = _INTEIROS.get
+
+    for dm in _DATA_LINE_RE.finditer(buf):
+        garagem = dm.group(14)
+        modelo = dm.group(15)
+        flag = '*' if b'*' in dm.group(13) else ''
+
+        data_txt = dm.group(2)
+        data = datas.get(data_txt)
+        if data is None:
+            data = datas[data_txt] = datetime.strptime(data_txt.decode('latin-1'), '%d/%m/%Y').date()
+
+        tanque, bomba = dm.group(5, 6)
+
+        # Campos numéricos: o regex já garante [\d.,]+, então basta traduzir
+        numeros = dm.group(7, 8, 9, 10, 11, 12)
+        try:
+            litros, hodo_ini, hodo_fim, km, km_acum, kml = [
+                float(v.translate(_BR_FLOAT_BYTES, b'.')) for v in numeros
+            ]
+        except ValueError:
+            litros, hodo_ini, hodo_fim, km, km_acum, kml = [
+                parse_float_br(v.decode('latin-1')) for v in numeros
+            ]
+
+        # _make evita o __new__ com argumentos nomeados (bem mais lento por registro)
+        registros.append(RegistroCombustivel._make((
+            dm.group(1).decode('latin-1'),  # prefixo
+            data,
+            dm.group(3).decode('latin-1'),  # hora
+            dm.group(4).decode('latin-1'),  # tipo
+            inteiro(tanque) or int(tanque),
+            inteiro(bomba) or int(bomba),
+            litros,
+            hodo_ini,  # hodometro_inicio
+            hodo_fim,  # hodometro_fim
+            km,
+            km_acum,  # km_acumulado
+            kml,
+            flag,
+            garagem.decode('latin-1') if garagem else '',  # garagem
+            modelo.decode(encoding, 'replace').strip() if modelo else '',  # modelo
+        )))
+
+    return registros
+
+
+def _parse_buffer(buf):
+    """Extrai cabeçalho e registros de um relatório PRAXIO já em memória"""
     empresa = ''
     periodo_inicio = None
     periodo_fim = None
 
-    # Regex para linhas de dados - começa com prefixo de 7 dígitos
-    data_line_re = re.compile(
-        r'^(\d{7})\s+'             # Prefixo
-        r'(\d{2}/\d{2}/\d{4})\s+'  # Data
-        r'(\d{2}:\d{2})\s+'        # Hora
-        r'(\w)\s+'                  # Tipo
-        r'(\d+)\s+'                 # Tanque
-        r'(\d+)\s+'                 # Bomba
-        r'([\d.,]+)\s+'             # Combustível (litros)
-        r'([\d.,]+)\s+'             # Hodômetro inicial
-        r'([\d.,]+)\s+'             # Hodômetro final
-        r'(-?[\d.,]+)\s+'           # Km
-        r'([\d.,]+)\s+'             # Km acumulado
-        r'(-?[\d.,]+)'              # Km/L
-    )
+    # Cabeçalho: só o trecho antes da primeira linha de dados
+    primeira = _DATA_LINE_RE.search(buf)
+    fim_cabecalho = primeira.start() if primeira else len(buf)
 
-    # Regex para Garagem + Modelo no final da linha
-    model_re = re.compile(r'(\d{3})\s+(\d{3}-.+?)\s*$')
+    encoding = _detectar_encoding(buf)
 
-    try:
-        f = open(filepath, 'r', encoding='latin-1')
-    except UnicodeDecodeError:
-        f = open(filepath, 'r', encoding='utf-8')
+    linha = _linha_cabecalho(buf, b'Empresa inicial:', fim_cabecalho, encoding)
+    m = _EMPRESA_RE.search(linha) if linha else None
+    if m:
+        empresa = m.group(1).strip()
 
-    try:
-        for line in f:
-            line = line.rstrip('\n\r')
-
-            # Extrair empresa
-            if 'Empresa inicial:' in line:
-                m = re.search(r'Empresa inicial:\s*\d+\s+(.+?)(?:\s{2,}|$)', line)
-                if m:
-                    empresa = m.group(1).strip()
-
-            # Extrair período
-            if 'Datas:' in line:
-                m = re.search(
-                    r'Datas:\s*(\d{2}/\d{2}/\d{4}).*?a\s+(\d{2}/\d{2}/\d{4})',
-                    line
-                )
-                if m:
-                    periodo_inicio = datetime.strptime(m.group(1), '%d/%m/%Y').date()
-                    periodo_fim = datetime.strptime(m.group(2), '%d/%m/%Y').date()
-
-            # Parse de linhas de dados
-            dm = data_line_re.match(line)
-            if not dm:
-                continue
-
-            # Extrair modelo do final da linha
-            mm = model_re.search(line)
-            garagem = mm.group(1) if mm else ''
-            modelo = mm.group(2).strip() if mm else ''
-
-            # Verificar flag * (entre Km/L e Garagem)
-            resto = line[dm.end():(mm.start() if mm else len(line))]
-            flag = '*' if '*' in resto else ''
-
-            registros.append({
-                'prefixo': dm.group(1),
-                'data': datetime.strptime(dm.group(2), '%d/%m/%Y').date(),
-                'hora': dm.group(3),
-                'tipo': dm.group(4),
-                'tanque': int(dm.group(5)),
-                'bomba': int(dm.group(6)),
-                'litros': parse_float_br(dm.group(7)),
-                'hodometro_inicio': parse_float_br(dm.group(8)),
-                'hodometro_fim': parse_float_br(dm.group(9)),
-                'km': parse_float_br(dm.group(10)),
-                'km_acumulado': parse_float_br(dm.group(11)),
-                'kml': parse_float_br(dm.group(12)),
-                'flag': flag,
-                'garagem': garagem,
-                'modelo': modelo,
-            })
-    finally:
-        f.close()
+    linha = _linha_cabecalho(buf, b'Datas:', fim_cabecalho, encoding)
+    m = _DATAS_RE.search(linha) if linha else None
+    if m:
+        periodo_inicio = datetime.strptime(m.group(1), '%d/%m/%Y').date()
+        periodo_fim = datetime.strptime(m.group(2), '%d/%m/%Y').date()
 
     return {
         'empresa': empresa,
         'periodo_inicio': periodo_inicio,
         'periodo_fim': periodo_fim,
-        'registros': registros
+        'registros': _parse_registros(buf, encoding)
     }
 
 
+def parse_arquivo_combustivel(filepath):
+    """
+    Faz o parse do arquivo TXT do sistema PRAXIO (relatório ABA).
+    Retorna dicionário com empresa, período e lista de registros.
+    """
+    # Arquivo mapeado em memória: o regex roda direto sobre os bytes e só os
+    # campos capturados são decodificados
+    with open(filepath, 'rb', buffering=1 << 20) as f:
+        try:
+            buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except (OSError, ValueError):
+            # Arquivo vazio ou sistema de arquivos sem mmap: uma leitura só
+            buf = f.read()
+
+    try:
+        return _parse_buffer(buf)
+    finally:
+        if isinstance(buf, mmap.mmap):
+            buf.close()
+
+
 def analisar_combustivel(registros):
     """
-    Analisa registros de combustível e identifica inconsistências.
+    Analisa registros de combustível (lista de RegistroCombustivel, como em
+    parse_arquivo_combustivel) e identifica inconsistências.
     Calcula média/mediana de Km/L por modelo e compara cada registro.
 
     Retorna dicionário com:
@@ -126,31 +226,41 @@ def analisar_combustivel(registros):
     if not registros:
         return {'resumo': {}, 'modelos': {}, 'alertas': []}
 
-    # --- Agrupar por modelo ---
-    por_modelo = {}
-    for r in registros:
-        modelo = r['modelo'] or 'DESCONHECIDO'
-        if modelo not in por_modelo:
-            por_modelo[modelo] = []
-        por_modelo[modelo].append(r)
+    # --- Colunas (uma lista por campo), lidas pelo nome do campo ---
+    prefixos, datas, horas, litros, hodo_inicio, hodo_fim, kms, kmls = (
+        list(map(attrgetter(campo), registros))
+        for campo in ('prefixo', 'data', 'hora', 'litros', 'hodometro_inicio',
+                      'hodometro_fim', 'km', 'kml')
+    )
+    modelos = [r.modelo or 'DESCONHECIDO' for r in registros]
+
+    # --- Agrupar índices por modelo e por prefixo numa única passada ---
+    por_modelo = defaultdict(list)
+    por_prefixo = defaultdict(list)
+    for idx, (modelo, pref) in enumerate(zip(modelos, prefixos)):
+        por_modelo[modelo].append(idx)
+        por_prefixo[pref].append(idx)
 
     # --- Calcular estatísticas por modelo ---
     modelos_stats = {}
-    for modelo, regs in por_modelo.items():
+    for modelo, indices in por_modelo.items():
         # Filtrar registros válidos para cálculo (km > 0 e kml > 0)
-        kml_validos = [r['kml'] for r in regs if r['kml'] > 0 and r['km'] > 0]
+        kml_validos = [kmls[i] for i in indices if kmls[i] > 0 and kms[i] > 0]
 
         if kml_validos:
-            media = sum(kml_validos) / len(kml_validos)
-            mediana = median(kml_validos)
-            kml_min = min(kml_validos)
-            kml_max = max(kml_validos)
+            # Uma única ordenação dá mediana, mínimo e máximo
+            n = len(kml_validos)
+            ordenados = sorted(kml_validos)
+            meio = n // 2
+            media = sum(kml_validos) / n
+            mediana = ordenados[meio] if n % 2 else (ordenados[meio - 1] + ordenados[meio]) / 2
+            kml_min = ordenados[0]
+            kml_max = ordenados[-1]
         else:
             media = mediana = kml_min = kml_max = 0
 
-        total_litros = sum(r['litros'] for r in regs)
-        total_km = sum(r['km'] for r in regs if r['km'] > 0)
-        prefixos = set(r['prefixo'] for r in regs)
+        total_litros = sum(litros[i] for i in indices)
+        total_km = sum(kms[i] for i in indices if kms[i] > 0)
 
         modelos_stats[modelo] = {
             'media_kml': round(media, 2),
@@ -159,139 +269,106 @@ def analisar_combustivel(registros):
             'max_kml': round(kml_max, 2),
             'total_litros': round(total_litros, 2),
             'total_km': round(total_km, 2),
-            'total_registros': len(regs),
-            'total_veiculos': len(prefixos),
+            'total_registros': len(indices),
+            'total_veiculos': len({prefixos[i] for i in indices}),
             'kml_geral': round(total_km / total_litros, 2) if total_litros > 0 else 0,
         }
 
-    # --- Também agrupar por prefixo para estatísticas por veículo ---
-    por_prefixo = {}
-    for r in registros:
-        pref = r['prefixo']
-        if pref not in por_prefixo:
-            por_prefixo[pref] = []
-        por_prefixo[pref].append(r)
+    # Mediana de referência e faixa normal de Km/L (75%–150% da mediana) de cada
+    # registro, resolvidas uma única vez por modelo. A faixa tem uma folga mínima
+    # para nunca divergir do cálculo exato do percentual feito nos registros fora dela.
+    ref_modelo = {}
+    for modelo, st in modelos_stats.items():
+        ref = st['mediana_kml']
+        ref_modelo[modelo] = (ref, ref * 0.75 * (1 + 1e-9), ref * 1.5 * (1 - 1e-9))
+    refs = [ref_modelo[m] for m in modelos]
+
+    # --- Registros de cada prefixo em ordem cronológica; cada registro guarda
+    # o índice do abastecimento anterior do mesmo veículo (-1 se for o primeiro) ---
+    anterior_idx = [-1] * len(registros)
+    for indices in por_prefixo.values():
+        indices.sort(key=lambda i: (datas[i], horas[i]))
+        for ant, atual in zip(indices, indices[1:]):
+            anterior_idx[atual] = ant
 
     # --- Identificar alertas ---
     alertas = []
+    por_severidade = {'alta': 0, 'media': 0, 'baixa': 0}
 
     for idx, r in enumerate(registros):
-        modelo = r['modelo'] or 'DESCONHECIDO'
-        stats = modelos_stats.get(modelo, {})
-        ref_kml = stats.get('mediana_kml', 0)
+        km = kms[idx]
+        kml = kmls[idx]
+        ref_kml, faixa_min, faixa_max = refs[idx]
 
+        # (tipo, argumentos da descrição); o texto só é montado se o alerta sair
         problemas = []
 
         # 1. Km zero ou negativo
-        if r['km'] <= 0:
-            problemas.append({
-                'tipo': 'KM_INVALIDO',
-                'descricao': f"Km {r['km']:.1f} (zero ou negativo)",
-                'severidade': 'alta'
-            })
+        if km <= 0:
+            problemas.append(('KM_INVALIDO', (km,)))
 
         # 2. Hodômetro decrescente
-        if r['hodometro_fim'] < r['hodometro_inicio']:
-            problemas.append({
-                'tipo': 'HODOMETRO_DECRESCENTE',
-                'descricao': f"Hodômetro final ({r['hodometro_fim']:.0f}) menor que inicial ({r['hodometro_inicio']:.0f})",
-                'severidade': 'alta'
-            })
+        if hodo_fim[idx] < hodo_inicio[idx]:
+            problemas.append(('HODOMETRO_DECRESCENTE', (hodo_fim[idx], hodo_inicio[idx])))
 
         # 3. Km/L muito abaixo da média do modelo (< 60%)
-        if ref_kml > 0 and r['kml'] > 0 and r['km'] > 0:
-            percentual = (r['kml'] / ref_kml) * 100
+        if ref_kml > 0 and kml > 0 and km > 0 and not faixa_min < kml < faixa_max:
+            percentual = (kml / ref_kml) * 100
 
             if percentual < 60:
-                problemas.append({
-                    'tipo': 'KML_MUITO_BAIXO',
-                    'descricao': (
-                        f"Km/L {r['kml']:.2f} está {100-percentual:.0f}% abaixo "
-                        f"da mediana do modelo ({ref_kml:.2f} Km/L)"
-                    ),
-                    'severidade': 'alta'
-                })
+                problemas.append(('KML_MUITO_BAIXO', (kml, 100 - percentual, ref_kml)))
             elif percentual < 75:
-                problemas.append({
-                    'tipo': 'KML_BAIXO',
-                    'descricao': (
-                        f"Km/L {r['kml']:.2f} está {100-percentual:.0f}% abaixo "
-                        f"da mediana do modelo ({ref_kml:.2f} Km/L)"
-                    ),
-                    'severidade': 'media'
-                })
+                problemas.append(('KML_BAIXO', (kml, 100 - percentual, ref_kml)))
 
             # 4. Km/L muito acima da média do modelo (> 150%)
             if percentual > 200:
-                problemas.append({
-                    'tipo': 'KML_MUITO_ALTO',
-                    'descricao': (
-                        f"Km/L {r['kml']:.2f} está {percentual-100:.0f}% acima "
-                        f"da mediana do modelo ({ref_kml:.2f} Km/L)"
-                    ),
-                    'severidade': 'alta'
-                })
+                problemas.append(('KML_MUITO_ALTO', (kml, percentual - 100, ref_kml)))
             elif percentual > 150:
-                problemas.append({
-                    'tipo': 'KML_ALTO',
-                    'descricao': (
-                        f"Km/L {r['kml']:.2f} está {percentual-100:.0f}% acima "
-                        f"da mediana do modelo ({ref_kml:.2f} Km/L)"
-                    ),
-                    'severidade': 'media'
-                })
+                problemas.append(('KML_ALTO', (kml, percentual - 100, ref_kml)))
 
         # 5. Hodômetro inconsistente com registros anterior/posterior do mesmo veículo
-        pref_regs = por_prefixo.get(r['prefixo'], [])
-        pref_idx = next((i for i, pr in enumerate(pref_regs) if pr is r), -1)
-        if pref_idx > 0:
-            anterior = pref_regs[pref_idx - 1]
-            if r['hodometro_inicio'] < anterior['hodometro_fim']:
-                problemas.append({
-                    'tipo': 'HODOMETRO_INCONSISTENTE',
-                    'descricao': (
-                        f"Hodômetro inicial ({r['hodometro_inicio']:.0f}) menor que "
-                        f"o final do abast. anterior ({anterior['hodometro_fim']:.0f})"
-                    ),
-                    'severidade': 'alta'
-                })
+        ant = anterior_idx[idx]
+        if ant >= 0 and hodo_inicio[idx] < hodo_fim[ant]:
+            problemas.append(('HODOMETRO_INCONSISTENTE', (hodo_inicio[idx], hodo_fim[ant])))
 
         # 6. Flag do sistema PRAXIO
-        if r['flag'] == '*':
-            # Só adicionar se não houver outro alerta mais específico
-            if not problemas:
-                problemas.append({
-                    'tipo': 'FLAG_SISTEMA',
-                    'descricao': 'Marcado pelo sistema PRAXIO (*)',
-                    'severidade': 'baixa'
-                })
+        # Só adicionar se não houver outro alerta mais específico
+        if r.flag == '*' and not problemas:
+            problemas.append(('FLAG_SISTEMA', ()))
 
         if problemas:
+            detalhes = []
+            for tipo, args in problemas:
+                severidade, descricao = _ALERTAS[tipo]
+                detalhes.append({
+                    'tipo': tipo,
+                    'descricao': descricao.format(*args),
+                    'severidade': severidade
+                })
+            severidade_max = max(p['severidade'] for p in detalhes)
+            por_severidade[severidade_max] += 1
             alertas.append({
                 'indice': idx,
                 'registro': r,
-                'problemas': problemas,
-                'severidade_max': max(
-                    p['severidade'] for p in problemas
-                ) if problemas else 'baixa'
+                'problemas': detalhes,
+                'severidade_max': severidade_max
             })
 
     # --- Resumo geral ---
-    total_litros = sum(r['litros'] for r in registros)
-    total_km = sum(r['km'] for r in registros if r['km'] > 0)
-    prefixos_unicos = set(r['prefixo'] for r in registros)
+    total_litros = sum(litros)
+    total_km = sum(km for km in kms if km > 0)
 
     resumo = {
         'total_registros': len(registros),
-        'total_veiculos': len(prefixos_unicos),
+        'total_veiculos': len(por_prefixo),
         'total_modelos': len(por_modelo),
         'total_litros': round(total_litros, 2),
         'total_km': round(total_km, 2),
         'media_kml': round(total_km / total_litros, 2) if total_litros > 0 else 0,
         'total_alertas': len(alertas),
-        'alertas_alta': sum(1 for a in alertas if a['severidade_max'] == 'alta'),
-        'alertas_media': sum(1 for a in alertas if a['severidade_max'] == 'media'),
-        'alertas_baixa': sum(1 for a in alertas if a['severidade_max'] == 'baixa'),
+        'alertas_alta': por_severidade['alta'],
+        'alertas_media': por_severidade['media'],
+        'alertas_baixa': por_severidade['baixa'],
     }
 
     return {
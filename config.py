@@ -1,5 +1,29 @@
 import os
 from datetime import timedelta
+from dotenv import load_dotenv
+
+basedir = os.path.dirname(os.path.abspath(__file__))
+ENV_PATH = os.path.join(basedir, '.env')  # caminho explícito para funcionar no WSGI
+
+_env_mtime = None
+
+
+def carregar_env():
+    """Carrega o arquivo .env apenas se ele mudou desde a última leitura neste processo"""
+    global _env_mtime
+    try:
+        mtime = os.stat(ENV_PATH).st_mtime
+    except OSError:
+        return False
+    if mtime == _env_mtime:
+        return False
+    _env_mtime = mtime
+    return load_dotenv(ENV_PATH, verbose=False, override=False)
+
+
+# Precisa rodar antes da leitura das variáveis na classe Config
+carregar_env()
+
 
 class Config:
     # Flask
@@ -13,7 +37,10 @@ class Config:
     _db_uri = os.environ.get('DATABASE_URL') or ''
     _engine_opts = {
         'pool_recycle': 280,  # Recicla conexões antes do timeout do MySQL (300s)
-        'pool_pre_ping': True  # Verifica conexão antes de usar
+        'pool_pre_ping': True,  # Verifica conexão antes de usar
+        # Cache de SQL compilado por engine; o padrão (500) fica curto para o
+        # número de consultas distintas dos blueprints somados
+        'query_cache_size': 1200
     }
     # SQLite precisa de check_same_thread=False para funcionar com threads
     if 'sqlite' in _db_uri or not _db_uri:
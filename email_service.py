@@ -1,44 +1,106 @@
+import queue
 import smtplib
+import time
+from string import Template
+from concurrent.futures import ThreadPoolExecutor
 from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from email.utils import formataddr
 from flask import current_app, render_template_string
-import threading
+
+# Envios rodam num pool fixo de threads, compartilhado pelo processo
+_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix='email')
+
+# Conexões SMTP já autenticadas (conexão, último uso), reaproveitadas entre envios
+_smtp_pool = queue.Queue()
+
+# Conexões ociosas há mais que isso são testadas com NOOP antes de reusar (segundos)
+SMTP_RECICLAR = 60
+
+# Corpo do aviso de novo chamado, montado uma vez na importação
+_NOVO_CHAMADO_TPL = Template('''
+    <h2>Novo Chamado Aberto</h2>
+    <p><strong>Chamado:</strong> #$id</p>
+    <p><strong>Título:</strong> $titulo</p>
+    <p><strong>Prioridade:</strong> $prioridade</p>
+    <p><strong>Cliente:</strong> $cliente</p>
+    <p><strong>Descrição:</strong></p>
+    <p>$descricao</p>
+    <hr>
+    <p>Acesse o sistema para atender este chamado.</p>
+    ''')
+
+
+def _conectar_smtp(config):
+    """Abre uma conexão SMTP com STARTTLS e login"""
+    server = smtplib.SMTP(config['MAIL_SERVER'], config['MAIL_PORT'])
+    server.starttls()
+    if config['MAIL_USERNAME']:
+        server.login(config['MAIL_USERNAME'], config['MAIL_PASSWORD'])
+    return server
+
+
+def _fechar_smtp(server):
+    try:
+        server.quit()
+    except (smtplib.SMTPException, OSError):
+        server.close()
+
+
+def _obter_smtp(config):
+    """Retira uma conexão do pool (validando as ociosas) ou abre uma nova"""
+    try:
+        server, usado_em = _smtp_pool.get_nowait()
+    except queue.Empty:
+        return _conectar_smtp(config)
+
+    if time.monotonic() - usado_em > SMTP_RECICLAR:
+        try:
+            if server.noop()[0] != 250:
+                raise smtplib.SMTPServerDisconnected('NOOP recusado')
+        except (smtplib.SMTPException, OSError):
+            _fechar_smtp(server)
+            return _conectar_smtp(config)
+    return server
 
 
 def send_email_async(app, msg, recipients):
     """Envia email de forma assíncrona"""
     with app.app_context():
+        config = current_app.config
+        server = None
         try:
-            with smtplib.SMTP(current_app.config['MAIL_SERVER'],
-                            current_app.config['MAIL_PORT']) as server:
-                server.starttls()
-                if current_app.config['MAIL_USERNAME']:
-                    server.login(current_app.config['MAIL_USERNAME'],
-                               current_app.config['MAIL_PASSWORD'])
-                server.send_message(msg)
+            server = _obter_smtp(config)
+            try:
+                server.send_message(msg, to_addrs=recipients)
+            except smtplib.SMTPServerDisconnected:
+                # Servidor derrubou a conexão reaproveitada: reconecta uma vez
+                server = _conectar_smtp(config)
+                server.send_message(msg, to_addrs=recipients)
+            _smtp_pool.put((server, time.monotonic()))
         except Exception as e:
+            if server is not None:
+                _fechar_smtp(server)
             current_app.logger.error(f'Erro ao enviar email: {e}')
 
 
-def send_email(subject, recipients, html_body, text_body=None):
-    """Envia email"""
+def send_email(subject, recipients, html_body, text_body=None, bcc=False):
+    """Envia email (com bcc=True os destinatários não veem uns aos outros)"""
     try:
+        if isinstance(recipients, str):
+            recipients = [recipients]
+
         msg = MIMEMultipart('alternative')
         msg['Subject'] = subject
         msg['From'] = formataddr(('MaxVia - Atendimento', current_app.config['MAIL_DEFAULT_SENDER']))
-        msg['To'] = ', '.join(recipients) if isinstance(recipients, list) else recipients
+        msg['To'] = 'undisclosed-recipients:;' if bcc else ', '.join(recipients)
 
         if text_body:
             msg.attach(MIMEText(text_body, 'plain'))
         msg.attach(MIMEText(html_body, 'html'))
 
-        # Envia em thread separada para não bloquear
-        thread = threading.Thread(
-            target=send_email_async,
-            args=(current_app._get_current_object(), msg, recipients)
-        )
-        thread.start()
+        # Envia no pool de threads para não bloquear
+        _executor.submit(send_email_async, current_app._get_current_object(), msg, recipients)
         return True
     except Exception as e:
         current_app.logger.error(f'Erro ao preparar email: {e}')
@@ -47,12 +109,13 @@ def send_email(subject, recipients, html_body, text_body=None):
 
 def notify_new_ticket(ticket):
     """Notifica atendentes sobre novo chamado (filtrando por categoria)"""
-    from models import User
+    from models import db, User
 
     recipients = []
 
     # Buscar todos admins, gestores e atendentes ativos
-    usuarios = User.query.filter(
+    # Categorias de todos carregadas numa consulta extra (selectin), não uma por usuário
+    usuarios = User.query.options(db.selectinload(User.categorias)).filter(
         User.tipo.in_(['admin', 'gestor', 'atendente']),
         User.ativo == True
     ).all()
@@ -64,7 +127,7 @@ def notify_new_ticket(ticket):
         # Atendentes recebem se:
         # - Não tem categorias atribuídas (vê todos), OU
         # - A categoria do chamado está entre as suas
-        elif usuario.categorias.count() == 0:
+        elif not usuario.categorias:
             recipients.append(usuario.email)
         elif ticket.categoria_id and usuario.pode_ver_categoria(ticket.categoria_id):
             recipients.append(usuario.email)
@@ -73,19 +136,16 @@ def notify_new_ticket(ticket):
         return
     subject = f'[Atendimento MaxVia] Novo Chamado #{ticket.id} - {ticket.titulo}'
 
-    html_body = f'''
-    <h2>Novo Chamado Aberto</h2>
-    <p><strong>Chamado:</strong> #{ticket.id}</p>
-    <p><strong>Título:</strong> {ticket.titulo}</p>
-    <p><strong>Prioridade:</strong> {ticket.prioridade.upper()}</p>
-    <p><strong>Cliente:</strong> {ticket.cliente.nome}</p>
-    <p><strong>Descrição:</strong></p>
-    <p>{ticket.descricao}</p>
-    <hr>
-    <p>Acesse o sistema para atender este chamado.</p>
-    '''
+    html_body = _NOVO_CHAMADO_TPL.substitute(
+        id=ticket.id,
+        titulo=ticket.titulo,
+        prioridade=ticket.prioridade.upper(),
+        cliente=ticket.cliente.nome,
+        descricao=ticket.descricao,
+    )
 
-    send_email(subject, recipients, html_body)
+    # Uma única mensagem para todos, sem expor os endereços entre si
+    send_email(subject, recipients, html_body, bcc=True)
 
 
 def notify_ticket_assigned(ticket):
@@ -2,28 +2,95 @@
 Utilitários para processamento e comparação de arquivos KML.
 """
 import xml.etree.ElementTree as ET
-from math import radians, sin, cos, sqrt, atan2
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import defaultdict
+from datetime import datetime
+from functools import lru_cache
+from io import BytesIO
+from math import radians, degrees, sin, cos, sqrt, asin, isfinite
 import zipfile
 import os
 import re
 
+# Padrões compilados uma única vez na importação
+# Padrões em bytes: aplicados direto ao conteúdo bruto, sem decodificar o arquivo
+_RE_COORDS = re.compile(
+    rb'<(?:[\w.-]+:)?coordinates[^>]*>(.*?)</(?:[\w.-]+:)?coordinates>', re.DOTALL | re.IGNORECASE
+)
+_RE_WHEN = re.compile(rb'<when[^>]*>(.*?)</when>', re.DOTALL | re.IGNORECASE)
+_RE_TZ = re.compile(r'[+-]\d{2}:\d{2}$')
+
+
+R_TERRA = 6371000  # Raio da Terra em metros
+
+
+def _haversine_rad(lat1, lon1, cos1, lat2, lon2, cos2, sin=sin, sqrt=sqrt, asin=asin):
+    """
+    Núcleo do Haversine (em metros) para pontos já em radianos, com o cosseno da
+    latitude de cada um calculado antes. Único lugar da fórmula: os laços quentes
+    convertem cada ponto uma vez e chamam esta função (sin/sqrt/asin como locais).
+    """
+    a = sin((lat2 - lat1) / 2) ** 2 + cos1 * cos2 * sin((lon2 - lon1) / 2) ** 2
+    return R_TERRA * 2 * asin(min(1.0, sqrt(a)))  # mesmo que 2 * atan2(sqrt(a), sqrt(1 - a))
+
 
 def haversine(lat1, lon1, lat2, lon2):
     """
     Calcula a distância em metros entre dois pontos geográficos
     usando a fórmula de Haversine.
     """
-    R = 6371000  # Raio da Terra em metros
-
     lat1_rad = radians(lat1)
     lat2_rad = radians(lat2)
-    delta_lat = radians(lat2 - lat1)
-    delta_lon = radians(lon2 - lon1)
+    return _haversine_rad(lat1_rad, radians(lon1), cos(lat1_rad), lat2_rad, radians(lon2), cos(lat2_rad))
+
+
+def _conteudos_kml(filepath):
+    """Retorna os bytes dos documentos KML de um arquivo KML ou KMZ"""
+    # Verificar se é KMZ (arquivo compactado)
+    if filepath.lower().endswith('.kmz'):
+        with zipfile.ZipFile(filepath, 'r') as kmz:
+            # Todos os .kml dentro do KMZ, na ordem do arquivo
+            return tuple(kmz.read(name) for name in kmz.namelist() if name.endswith('.kml'))
+    # Arquivo KML normal
+    with open(filepath, 'rb') as f:
+        return (f.read(),)
 
-    a = sin(delta_lat / 2) ** 2 + cos(lat1_rad) * cos(lat2_rad) * sin(delta_lon / 2) ** 2
-    c = 2 * atan2(sqrt(a), sqrt(1 - a))
 
-    return R * c
+def _kml_processado(filepath):
+    """
+    Retorna (latitudes, longitudes, tempo_minutos) do arquivo, com cache por
+    (caminho, mtime, tamanho) para não reler/descompactar o mesmo arquivo.
+    """
+    st = os.stat(filepath)
+    return _kml_processado_cache(filepath, st.st_mtime_ns, st.st_size)
+
+
+@lru_cache(maxsize=64)
+def _kml_processado_cache(filepath, mtime_ns, tamanho):
+    """
+    Lê o arquivo uma vez e extrai coordenadas e tempo de trajeto; mtime e tamanho
+    entram só na chave. O cache guarda só o resultado, não o conteúdo bruto: as
+    coordenadas como dois array('d') (16 bytes por ponto) e o tempo como inteiro.
+    """
+    conteudos = _conteudos_kml(filepath)
+    coordenadas = []
+    # No KMZ, usa o primeiro .kml que tiver coordenadas
+    for content in conteudos:
+        coordenadas = _ler_coordenadas(BytesIO(content))
+        if coordenadas:
+            break
+    # Tempo de trajeto vem do primeiro .kml; uma falha nos timestamps não pode
+    # descartar as coordenadas (mesmo comportamento de quando eram lidos à parte)
+    tempo = None
+    if conteudos:
+        try:
+            tempo = _extrair_tempo_do_conteudo(conteudos[0])
+        except Exception as e:
+            print(f"Erro ao extrair tempo de trajeto: {e}")
+    return (array('d', [lat for lat, _ in coordenadas]),
+            array('d', [lon for _, lon in coordenadas]),
+            tempo)
 
 
 def extrair_coordenadas_kml(filepath):
@@ -34,117 +101,92 @@ def extrair_coordenadas_kml(filepath):
     if not filepath or not os.path.exists(filepath):
         return []
 
-    coordenadas = []
-
     try:
-        # Verificar se é KMZ (arquivo compactado)
-        if filepath.lower().endswith('.kmz'):
-            with zipfile.ZipFile(filepath, 'r') as kmz:
-                # Procurar pelo arquivo doc.kml dentro do KMZ
-                for name in kmz.namelist():
-                    if name.endswith('.kml'):
-                        with kmz.open(name) as kml_file:
-                            content = kml_file.read()
-                            coordenadas = _parse_kml_content(content)
-                            if coordenadas:
-                                break
-        else:
-            # Arquivo KML normal
-            with open(filepath, 'rb') as f:
-                content = f.read()
-                coordenadas = _parse_kml_content(content)
-
+        lats, lons, _ = _kml_processado(filepath)
+        return list(zip(lats, lons))
     except Exception as e:
         print(f"Erro ao extrair coordenadas: {e}")
         return []
 
-    return coordenadas
-
 
-def _parse_kml_content(content):
+def _ler_coordenadas(arquivo):
     """
-    Parse do conteúdo XML do KML.
-    Usa regex para extrair coordenadas, mais robusto que XML parsing.
+    Extrai coordenadas de um KML aberto em modo binário, em streaming (iterparse),
+    casando a tag <coordinates> em qualquer namespace e liberando cada elemento já
+    lido. Se o XML for inválido, volta ao regex sobre o conteúdo inteiro.
     """
     coordenadas = []
 
     try:
-        content_str = content.decode('utf-8', errors='ignore')
-
-        # Método 1: Usar regex para extrair coordenadas diretamente
-        # Isso é mais robusto que parsing XML quando há namespaces complexos
-        coords_pattern = r'<coordinates[^>]*>(.*?)</coordinates>'
-        matches = re.findall(coords_pattern, content_str, re.DOTALL | re.IGNORECASE)
-
-        for match in matches:
-            coords_text = match.strip()
-            # Formato: lon,lat,alt ou lon,lat separados por espaços, tabs ou quebras de linha
-            # Dividir por qualquer whitespace
-            coord_pairs = re.split(r'\s+', coords_text)
-
-            for coord in coord_pairs:
-                coord = coord.strip()
-                if not coord:
-                    continue
-                parts = coord.split(',')
-                if len(parts) >= 2:
-                    try:
-                        lon = float(parts[0])
-                        lat = float(parts[1])
-                        # Validar coordenadas
-                        if -180 <= lon <= 180 and -90 <= lat <= 90:
-                            coordenadas.append((lat, lon))
-                    except ValueError:
-                        continue
-
-        # Método 2: Se não encontrou com regex, tenta parsing XML
-        if not coordenadas:
-            coordenadas = _parse_kml_xml(content_str)
-
-    except Exception as e:
-        print(f"Erro ao fazer parse do KML: {e}")
-
-    return coordenadas
+        for _, elem in ET.iterparse(arquivo, events=('end',)):
+            if elem.tag.rpartition('}')[2].lower() == 'coordinates' and elem.text:
+                _parse_coordenadas_texto(elem.text, coordenadas)
+            elem.clear()
+        return coordenadas
+    except ET.ParseError:
+        arquivo.seek(0)
+        return _parse_kml_content(arquivo.read())
+
+
+def _parse_coordenadas_texto(coords_text, coordenadas):
+    """Adiciona à lista os pares (lat, lon) válidos de um bloco lon,lat[,alt] de KML"""
+    # Formato: lon,lat,alt ou lon,lat separados por espaços, tabs ou quebras de linha
+    # str.split() sem argumento já divide por qualquer whitespace e descarta vazios
+    tokens = coords_text.split()
+    if not tokens:
+        return
+    # Caminho rápido: todos os pontos com o mesmo número de campos -> converte o
+    # bloco inteiro de uma vez com map(float) e fatia lon/lat pelo passo
+    virgulas = tokens[0].count(',')
+    if virgulas and all(t.count(',') == virgulas for t in tokens):
+        passo = virgulas + 1
+        try:
+            valores = list(map(float, coords_text.replace(',', ' ').split()))
+        except ValueError:
+            valores = None
+        if valores is not None and len(valores) == passo * len(tokens):
+            lons = valores[0::passo]
+            lats = valores[1::passo]
+            # Validar coordenadas do bloco de uma vez: soma finita descarta nan/inf
+            # (que confundiriam min/max) e os extremos confirmam as faixas
+            if (isfinite(sum(lons) + sum(lats))
+                    and -180 <= min(lons) and max(lons) <= 180
+                    and -90 <= min(lats) and max(lats) <= 90):
+                coordenadas.extend(zip(lats, lons))
+            else:
+                coordenadas.extend([(lat, lon) for lon, lat in zip(lons, lats)
+                                    if -180 <= lon <= 180 and -90 <= lat <= 90])
+            return
+
+    for coord in tokens:
+        parts = coord.split(',')
+        if len(parts) >= 2:
+            try:
+                lon = float(parts[0])
+                lat = float(parts[1])
+                # Validar coordenadas
+                if -180 <= lon <= 180 and -90 <= lat <= 90:
+                    coordenadas.append((lat, lon))
+            except ValueError:
+                continue
 
 
-def _parse_kml_xml(content_str):
+def _parse_kml_content(content):
     """
-    Tenta fazer parsing XML do KML removendo namespaces.
+    Parse do conteúdo XML do KML.
+    Usa regex para extrair coordenadas, mais robusto que XML parsing.
     """
     coordenadas = []
 
     try:
-        # Remover todas as declarações de namespace
-        content_clean = re.sub(r'\sxmlns[^=]*="[^"]*"', '', content_str)
-        # Remover prefixos de namespace nas tags
-        content_clean = re.sub(r'<(/?)[\w]+:', r'<\1', content_clean)
-
-        root = ET.fromstring(content_clean)
-
-        # Procurar por tags <coordinates> em qualquer lugar do documento
-        for elem in root.iter():
-            if elem.tag.lower() == 'coordinates' or elem.tag.lower().endswith('coordinates'):
-                if elem.text:
-                    coords_text = elem.text.strip()
-                    coord_pairs = re.split(r'\s+', coords_text)
-
-                    for coord in coord_pairs:
-                        coord = coord.strip()
-                        if not coord:
-                            continue
-                        parts = coord.split(',')
-                        if len(parts) >= 2:
-                            try:
-                                lon = float(parts[0])
-                                lat = float(parts[1])
-                                if -180 <= lon <= 180 and -90 <= lat <= 90:
-                                    coordenadas.append((lat, lon))
-                            except ValueError:
-                                continue
+        # Regex direto nas tags <coordinates>, com ou sem prefixo de namespace
+        # (cobre também prefixos não declarados, que derrubam o parser XML);
+        # só o texto de cada bloco é decodificado
+        for match in _RE_COORDS.findall(content):
+            _parse_coordenadas_texto(match.decode('utf-8', errors='ignore'), coordenadas)
 
     except Exception as e:
-        # Silenciosamente ignorar erros de XML - já tentamos regex
-        pass
+        print(f"Erro ao fazer parse do KML: {e}")
 
     return coordenadas
 
@@ -156,32 +198,176 @@ def calcular_distancia_total(coordenadas):
     if len(coordenadas) < 2:
         return 0
 
+    # Cada ponto é convertido para radianos (e seu cosseno) uma única vez:
+    # o ponto final de um trecho é o inicial do próximo
     distancia_total = 0
-    for i in range(len(coordenadas) - 1):
-        lat1, lon1 = coordenadas[i]
-        lat2, lon2 = coordenadas[i + 1]
-        distancia_total += haversine(lat1, lon1, lat2, lon2)
+    lat1, lon1 = coordenadas[0]
+    lat1_rad = radians(lat1)
+    lon1_rad = radians(lon1)
+    cos1 = cos(lat1_rad)
+    for lat2, lon2 in coordenadas[1:]:
+        lat2_rad = radians(lat2)
+        lon2_rad = radians(lon2)
+        cos2 = cos(lat2_rad)
+        distancia_total += _haversine_rad(lat1_rad, lon1_rad, cos1, lat2_rad, lon2_rad, cos2)
+        lat1_rad, lon1_rad, cos1 = lat2_rad, lon2_rad, cos2
 
     return distancia_total / 1000  # Converter para km
 
 
-def distancia_ponto_para_linha(ponto, linha_coords, tolerancia_metros=100):
+def _indice_por_latitude(coords):
+    """
+    Prepara os pontos para a busca de vizinho mais próximo: ordenados por latitude,
+    já em radianos e com o cosseno da latitude calculado uma única vez por ponto.
+    """
+    pontos = sorted(coords)
+    lats = [radians(lat) for lat, _ in pontos]
+    lons = [radians(lon) for _, lon in pontos]
+    cossenos = [cos(lat) for lat in lats]
+    return lats, lons, cossenos
+
+
+def _distancia_minima(ponto, indice):
+    """
+    Menor distância (em metros) do ponto a algum ponto do índice.
+    Varre a partir da latitude mais próxima para os dois lados e para quando só a
+    diferença de latitude já supera a melhor distância (o arco de meridiano é um
+    limite inferior da distância de Haversine), sem precisar olhar a linha inteira.
+    """
+    lats, lons, cossenos = indice
+    lat_p = radians(ponto[0])
+    lon_p = radians(ponto[1])
+    cos_p = cos(lat_p)
+    menor = float('inf')
+    n = len(lats)
+    acima = bisect_left(lats, lat_p)
+    abaixo = acima - 1
+
+    while acima < n or abaixo >= 0:
+        # Próximo candidato: o lado com a menor diferença de latitude
+        delta_acima = lats[acima] - lat_p if acima < n else float('inf')
+        delta_abaixo = lat_p - lats[abaixo] if abaixo >= 0 else float('inf')
+        if delta_acima <= delta_abaixo:
+            i, delta = acima, delta_acima
+            acima += 1
+        else:
+            i, delta = abaixo, delta_abaixo
+            abaixo -= 1
+
+        # Folga relativa cobre o arredondamento da fórmula completa
+        if R_TERRA * delta > menor * (1 + 1e-9):
+            break
+
+        # Radianos e cossenos já vêm prontos do índice
+        dist = _haversine_rad(lat_p, lon_p, cos_p, lats[i], lons[i], cossenos[i])
+        if dist < menor:
+            menor = dist
+
+    return menor
+
+
+def _passos_grade(coords_a, coords_b, tolerancia_metros):
     """
-    Calcula a menor distância de um ponto para uma linha (sequência de coordenadas).
-    Retorna a distância em metros.
+    Tamanho das células (graus de latitude, graus de longitude) para a grade de
+    tolerância: qualquer par a até tolerancia_metros fica em células vizinhas.
+    Retorna None quando a grade não se aplica (tolerância nula, polos ou trajetos
+    encostados no antimeridiano, onde a longitude dá a volta).
     """
-    if not linha_coords:
-        return float('inf')
+    if tolerancia_metros <= 0:
+        return None
 
-    lat_ponto, lon_ponto = ponto
-    menor_distancia = float('inf')
+    lats = [lat for lat, _ in coords_a] + [lat for lat, _ in coords_b]
+    lons = [lon for _, lon in coords_a] + [lon for _, lon in coords_b]
+    cos_min = cos(radians(max(abs(min(lats)), abs(max(lats)))))
+    if cos_min < 0.01:
+        return None
 
-    for lat, lon in linha_coords:
-        dist = haversine(lat_ponto, lon_ponto, lat, lon)
-        if dist < menor_distancia:
-            menor_distancia = dist
+    # Pelo Haversine: distância >= R * dlat e >= 2R * asin(cos_min * sin(dlon / 2))
+    passo_lat = degrees(tolerancia_metros / R_TERRA) * (1 + 1e-9)
+    passo_lon = degrees(2 * asin(min(1.0, sin(tolerancia_metros / (2 * R_TERRA)) / cos_min))) * (1 + 1e-9)
+    if min(lons) - passo_lon <= -180 or max(lons) + passo_lon >= 180:
+        return None
 
-    return menor_distancia
+    return passo_lat, passo_lon
+
+
+def _indice_grade(coords, passos):
+    """Agrupa os pontos (já em radianos, com o cosseno da latitude) por célula da grade"""
+    passo_lat, passo_lon = passos
+    grade = defaultdict(list)
+    for lat, lon in coords:
+        lat_r = radians(lat)
+        grade[(int(lat // passo_lat), int(lon // passo_lon))].append((lat_r, radians(lon), cos(lat_r)))
+    return grade, passo_lat, passo_lon
+
+
+def _distancia_na_grade(ponto, indice):
+    """
+    Menor distância (em metros) do ponto aos pontos da sua célula e das 8 vizinhas.
+    Se o resultado estiver dentro da tolerância da grade, é a distância mínima exata;
+    acima dela, só indica que não há ponto dentro da tolerância.
+    """
+    grade, passo_lat, passo_lon = indice
+    lat, lon = ponto
+    cy = int(lat // passo_lat)
+    cx = int(lon // passo_lon)
+    lat_p = radians(lat)
+    lon_p = radians(lon)
+    cos_p = cos(lat_p)
+    menor = float('inf')
+
+    for y in (cy - 1, cy, cy + 1):
+        for x in (cx - 1, cx, cx + 1):
+            for lat_i, lon_i, cos_i in grade.get((y, x), ()):
+                dist = _haversine_rad(lat_p, lon_p, cos_p, lat_i, lon_i, cos_i)
+                if dist < menor:
+                    menor = dist
+
+    return menor
+
+
+def _ha_ponto_na_grade(ponto, indice, tolerancia_metros):
+    """
+    Indica se algum ponto da grade está a até tolerancia_metros do ponto.
+    Para no primeiro encontrado e descarta pela diferença de latitude (limite
+    inferior da distância) antes de calcular o Haversine.
+    """
+    grade, passo_lat, passo_lon = indice
+    lat, lon = ponto
+    cy = int(lat // passo_lat)
+    cx = int(lon // passo_lon)
+    lat_p = radians(lat)
+    lon_p = radians(lon)
+    cos_p = cos(lat_p)
+    limite_lat = tolerancia_metros / R_TERRA * (1 + 1e-9)
+
+    for y in (cy, cy - 1, cy + 1):
+        for x in (cx, cx - 1, cx + 1):
+            for lat_i, lon_i, cos_i in grade.get((y, x), ()):
+                if abs(lat_i - lat_p) > limite_lat:
+                    continue
+                if _haversine_rad(lat_p, lon_p, cos_p, lat_i, lon_i, cos_i) <= tolerancia_metros:
+                    return True
+
+    return False
+
+
+def _ha_ponto_na_faixa(ponto, indice, tolerancia_metros):
+    """
+    Indica se algum ponto do índice por latitude está a até tolerancia_metros do
+    ponto, olhando só a faixa de latitudes que pode estar dentro da tolerância.
+    """
+    lats, lons, cossenos = indice
+    lat_p = radians(ponto[0])
+    lon_p = radians(ponto[1])
+    cos_p = cos(lat_p)
+    limite_lat = tolerancia_metros / R_TERRA * (1 + 1e-9)
+
+    for i in range(bisect_left(lats, lat_p - limite_lat), bisect_right(lats, lat_p + limite_lat)):
+        if _haversine_rad(lat_p, lon_p, cos_p, lats[i], lons[i], cossenos[i]) <= tolerancia_metros:
+            return True
+
+    return False
 
 
 def comparar_kml(kml_planejado_path, kml_executado_path, tolerancia_metros=100):
@@ -242,9 +428,23 @@ def comparar_kml(kml_planejado_path, kml_executado_path, tolerancia_metros=100):
     # Para cada ponto executado, verificar se está próximo da rota planejada
     pontos_fora = 0
     desvio_maximo = 0
-
+    # Pontos repetidos não mudam a menor distância: os índices usam só os distintos
+    unicos_planejado = list(dict.fromkeys(coords_planejado))
+    unicos_executado = list(dict.fromkeys(coords_executado))
+    indice_planejado = _indice_por_latitude(unicos_planejado)
+    # Grade de células do tamanho da tolerância: resolve a maioria dos pontos
+    # olhando só as células vizinhas; a busca completa fica para os de fora
+    passos = _passos_grade(coords_planejado, coords_executado, tolerancia_metros)
+    grade_planejado = _indice_grade(unicos_planejado, passos) if passos else None
+
+    anterior = None
     for ponto in coords_executado:
-        dist = distancia_ponto_para_linha(ponto, coords_planejado)
+        # GPS parado repete o mesmo ponto em sequência: reaproveita a distância
+        if ponto != anterior:
+            anterior = ponto
+            dist = _distancia_na_grade(ponto, grade_planejado) if passos else float('inf')
+            if dist > tolerancia_metros:
+                dist = _distancia_minima(ponto, indice_planejado)
 
         if dist > tolerancia_metros:
             pontos_fora += 1
@@ -263,10 +463,20 @@ def comparar_kml(kml_planejado_path, kml_executado_path, tolerancia_metros=100):
     # --- Direção 2: Rota planejada foi coberta pelo executado? ---
     # Para cada ponto planejado, verificar se algum ponto executado passou perto
     pontos_planejados_cobertos = 0
+    # Basta saber se existe algum ponto dentro da tolerância: para no primeiro
+    if passos:
+        indice_executado = _indice_grade(unicos_executado, passos)
+        ha_ponto_proximo = _ha_ponto_na_grade
+    else:
+        indice_executado = _indice_por_latitude(unicos_executado)
+        ha_ponto_proximo = _ha_ponto_na_faixa
 
+    anterior = None
     for ponto in coords_planejado:
-        dist = distancia_ponto_para_linha(ponto, coords_executado)
-        if dist <= tolerancia_metros:
+        if ponto != anterior:
+            anterior = ponto
+            coberto = ha_ponto_proximo(ponto, indice_executado, tolerancia_metros)
+        if coberto:
             pontos_planejados_cobertos += 1
 
     if len(coords_planejado) > 0:
@@ -290,63 +500,35 @@ def extrair_tempo_trajeto(filepath):
         return None
 
     try:
-        if filepath.lower().endswith('.kmz'):
-            with zipfile.ZipFile(filepath, 'r') as kmz:
-                for name in kmz.namelist():
-                    if name.endswith('.kml'):
-                        with kmz.open(name) as kml_file:
-                            content = kml_file.read()
-                            return _extrair_tempo_do_conteudo(content)
-        else:
-            with open(filepath, 'rb') as f:
-                content = f.read()
-                return _extrair_tempo_do_conteudo(content)
+        return _kml_processado(filepath)[2]
     except Exception as e:
         print(f"Erro ao extrair tempo de trajeto: {e}")
         return None
 
-    return None
-
 
 def _extrair_tempo_do_conteudo(content):
     """
     Extrai timestamps do conteúdo KML e calcula tempo de trajeto.
     """
-    from datetime import datetime
-
-    content_str = content.decode('utf-8', errors='ignore')
-    timestamps = []
-
-    # Padrão 1: <when> tags (usado em gx:Track)
-    when_pattern = r'<when[^>]*>(.*?)</when>'
-    matches = re.findall(when_pattern, content_str, re.DOTALL | re.IGNORECASE)
-
-    for match in matches:
-        ts = _parse_timestamp(match.strip())
-        if ts:
-            timestamps.append(ts)
-
-    # Padrão 2: <TimeStamp><when> (usado em Placemarks)
-    timestamp_pattern = r'<TimeStamp[^>]*>.*?<when[^>]*>(.*?)</when>.*?</TimeStamp>'
-    matches = re.findall(timestamp_pattern, content_str, re.DOTALL | re.IGNORECASE)
-
-    for match in matches:
-        ts = _parse_timestamp(match.strip())
-        if ts:
-            timestamps.append(ts)
-
-    # Padrão 3: <gx:TimeStamp> ou atributos de tempo
-    gx_pattern = r'<gx:TimeStamp[^>]*>.*?<when[^>]*>(.*?)</when>.*?</gx:TimeStamp>'
-    matches = re.findall(gx_pattern, content_str, re.DOTALL | re.IGNORECASE)
-
-    for match in matches:
-        ts = _parse_timestamp(match.strip())
-        if ts:
-            timestamps.append(ts)
-
-    if len(timestamps) >= 2:
-        timestamps.sort()
-        tempo_total = (timestamps[-1] - timestamps[0]).total_seconds() / 60
+    inicio = fim = None
+    total = 0
+
+    # <when> cobre gx:Track, <TimeStamp><when> e <gx:TimeStamp><when>;
+    # basta guardar o menor e o maior instante
+    for match in _RE_WHEN.findall(content):
+        ts = _parse_timestamp(match.decode('utf-8', errors='ignore').strip())
+        if ts is None:
+            continue
+        total += 1
+        if inicio is None:
+            inicio = fim = ts
+        elif ts < inicio:
+            inicio = ts
+        elif ts > fim:
+            fim = ts
+
+    if total >= 2:
+        tempo_total = (fim - inicio).total_seconds() / 60
         return round(tempo_total)
 
     return None
@@ -356,27 +538,23 @@ def _parse_timestamp(ts_str):
     """
     Faz parse de uma string de timestamp em vários formatos.
     """
-    from datetime import datetime
-
-    formatos = [
-        '%Y-%m-%dT%H:%M:%SZ',
-        '%Y-%m-%dT%H:%M:%S.%fZ',
-        '%Y-%m-%dT%H:%M:%S',
-        '%Y-%m-%dT%H:%M:%S.%f',
-        '%Y-%m-%d %H:%M:%S',
-        '%Y/%m/%d %H:%M:%S',
-    ]
-
-    # Remover timezone offset se presente (+00:00, -03:00, etc)
-    ts_str = re.sub(r'[+-]\d{2}:\d{2}$', '', ts_str)
-
-    for fmt in formatos:
-        try:
-            return datetime.strptime(ts_str, fmt)
-        except ValueError:
-            continue
+    # Remover timezone offset se presente (+00:00, -03:00, etc) e o sufixo Z
+    ts_str = _RE_TZ.sub('', ts_str)
+    if ts_str.endswith('Z'):
+        ts_str = ts_str[:-1]
+
+    # fromisoformat cobre os formatos ISO (com T ou espaço, com ou sem fração).
+    # Offsets que o regex não remove (+0300, +03) também são aceitos por ele:
+    # descartar o fuso como nos demais, para nunca misturar datas com e sem fuso
+    try:
+        return datetime.fromisoformat(ts_str).replace(tzinfo=None)
+    except ValueError:
+        pass
 
-    return None
+    try:
+        return datetime.strptime(ts_str, '%Y/%m/%d %H:%M:%S')
+    except ValueError:
+        return None
 
 
 def validar_kml(filepath):
@@ -419,3 +597,4 @@ def analisar_kml(filepath):
         resultado['tempo_minutos'] = tempo
 
     return resultado
+
@@ -5,7 +5,7 @@ Remove todos os chamados e usuários não-admin.
 """
 
 from app import create_app
-from models import db, User, Ticket, TicketHistory, Attachment, Category
+from models import db, User, Ticket, TicketHistory, Attachment, Category, atendente_categoria
 
 app = create_app()
 
@@ -14,20 +14,27 @@ def limpar_base():
         print("=== Limpeza da Base de Dados ===\n")
 
         # Mostrar o que será removido
-        total_tickets = Ticket.query.count()
-        total_historico = TicketHistory.query.count()
-        total_anexos = Attachment.query.count()
-        usuarios_remover = User.query.filter(User.tipo != 'admin').all()
-        admins = User.query.filter(User.tipo == 'admin').all()
+        # Contagens em uma única consulta
+        total_tickets, total_historico, total_anexos, total_usuarios = db.session.execute(db.select(
+            db.select(db.func.count()).select_from(Ticket).scalar_subquery(),
+            db.select(db.func.count()).select_from(TicketHistory).scalar_subquery(),
+            db.select(db.func.count()).select_from(Attachment).scalar_subquery(),
+            db.select(db.func.count()).select_from(User).where(User.tipo != 'admin').scalar_subquery(),
+        )).one()
+        # Só as colunas exibidas, sem montar objetos do ORM
+        admins = db.session.query(User.nome, User.email).filter(User.tipo == 'admin').all()
 
         print(f"Chamados a remover: {total_tickets}")
         print(f"Históricos a remover: {total_historico}")
         print(f"Anexos a remover: {total_anexos}")
-        print(f"Usuários a remover: {len(usuarios_remover)}")
+        print(f"Usuários a remover: {total_usuarios}")
         print(f"Admins a manter: {len(admins)}")
 
-        for admin in admins:
-            print(f"  - {admin.nome} ({admin.email})")
+        if admins:
+            print('\n'.join(f"  - {nome} ({email})" for nome, email in admins))
+
+        # Encerrar a transação de leitura antes de aguardar a confirmação
+        db.session.rollback()
 
         print("\n" + "="*40)
         confirma = input("Confirma limpeza? (digite 'SIM' para confirmar): ")
@@ -38,32 +45,34 @@ def limpar_base():
 
         print("\nLimpando...")
 
-        # 1. Remover anexos
-        Attachment.query.delete()
-        print("- Anexos removidos")
-
-        # 2. Remover histórico
-        TicketHistory.query.delete()
-        print("- Histórico removido")
-
-        # 3. Remover chamados
-        Ticket.query.delete()
-        print("- Chamados removidos")
-
-        # 4. Limpar tabela de associação atendente_categoria para usuários não-admin
-        from models import atendente_categoria
-        usuarios_nao_admin = User.query.filter(User.tipo != 'admin').all()
-        for usuario in usuarios_nao_admin:
-            usuario.categorias = []
-        db.session.commit()
-        print("- Associações de categorias removidas")
-
-        # 5. Remover usuários não-admin
-        User.query.filter(User.tipo != 'admin').delete()
-        print("- Usuários não-admin removidos")
-
-        # Commit
-        db.session.commit()
+        # DELETE em massa, sem carregar nem sincronizar objetos na sessão;
+        # tudo numa única transação: commit ao sair do bloco, rollback em erro
+        sem_sync = {'synchronize_session': False}
+        with db.session.begin():
+            # 1. Remover anexos
+            db.session.execute(db.delete(Attachment), execution_options=sem_sync)
+            print("- Anexos removidos")
+
+            # 2. Remover histórico
+            db.session.execute(db.delete(TicketHistory), execution_options=sem_sync)
+            print("- Histórico removido")
+
+            # 3. Remover chamados
+            db.session.execute(db.delete(Ticket), execution_options=sem_sync)
+            print("- Chamados removidos")
+
+            # 4. Limpar tabela de associação atendente_categoria para usuários não-admin
+            nao_admin = db.select(User.id).where(User.tipo != 'admin')
+            db.session.execute(
+                atendente_categoria.delete().where(atendente_categoria.c.user_id.in_(nao_admin))
+            )
+            print("- Associações de categorias removidas")
+
+            # 5. Remover usuários não-admin
+            db.session.execute(
+                db.delete(User).where(User.tipo != 'admin'), execution_options=sem_sync
+            )
+            print("- Usuários não-admin removidos")
 
         print("\n=== Limpeza concluída! ===")
         print(f"Admins mantidos: {User.query.filter(User.tipo == 'admin').count()}")
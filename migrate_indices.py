@@ -0,0 +1,28 @@
+"""
+Script de migração para criar os índices declarados nos models.
+db.create_all() só cria índices junto com tabelas novas; em bases existentes,
+executar após o deploy: python migrate_indices.py
+"""
+import sys
+import os
+sys.path.insert(0, os.path.dirname(__file__))
+
+from app import create_app
+from models import db
+
+app = create_app()
+with app.app_context():
+    # Índices existentes lidos do catálogo (MySQL não tem CREATE INDEX IF NOT EXISTS)
+    inspetor = db.inspect(db.engine)
+    for tabela in db.metadata.sorted_tables:
+        if not inspetor.has_table(tabela.name):
+            continue
+        existentes = {i['name'] for i in inspetor.get_indexes(tabela.name)}
+        for indice in sorted(tabela.indexes, key=lambda i: i.name):
+            if indice.name in existentes:
+                print(f"  = Índice {indice.name} já existe.")
+                continue
+            indice.create(db.engine)
+            print(f"  + Índice {indice.name} criado em {tabela.name}.")
+
+    print("\nMigração concluída.")
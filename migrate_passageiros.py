@@ -1,13 +1,14 @@
 """
 Script de migração para adicionar tabelas e colunas do módulo de passageiros.
-Executar uma vez após o deploy: python migrate_passageiros.py
+Executar após o deploy: python migrate_passageiros.py
+Pode ser executado de novo: só adiciona as colunas que ainda não existem.
 """
 import sys
 import os
 sys.path.insert(0, os.path.dirname(__file__))
 
 from app import create_app
-from models import db
+from models import db, ClienteTurno, PassageiroBase, Passageiro, Roteirizacao
 
 app = create_app()
 with app.app_context():
@@ -21,18 +22,47 @@ with app.app_context():
         ("passageiros", "passageiro_base_id", "INTEGER REFERENCES passageiros_base(id)"),
     ]
 
-    for tabela, coluna, tipo in alteracoes:
-        try:
-            db.session.execute(db.text(
-                f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}'
-            ))
-            db.session.commit()
-            print(f"  + Coluna {tabela}.{coluna} adicionada.")
-        except Exception as e:
-            db.session.rollback()
-            if 'duplicate column' in str(e).lower() or 'already exists' in str(e).lower():
+    # Colunas existentes lidas uma vez do catálogo; ALTER TABLE só para as que
+    # faltam, numa única conexão. No SQLite tudo fica numa transação; no MySQL
+    # cada ALTER TABLE faz commit implícito, então uma falha no meio deixa as
+    # colunas anteriores já criadas (a checagem acima permite rodar de novo)
+    inspetor = db.inspect(db.engine)
+    with db.engine.begin() as conn:
+        adicionadas = set()
+        for tabela, coluna, tipo in alteracoes:
+            if coluna in {c['name'] for c in inspetor.get_columns(tabela)}:
                 print(f"  = Coluna {tabela}.{coluna} já existe.")
-            else:
-                print(f"  ! Erro em {tabela}.{coluna}: {e}")
+                continue
+            conn.execute(db.text(f'ALTER TABLE {tabela} ADD COLUMN {coluna} {tipo}'))
+            adicionadas.add(coluna)
+            print(f"  + Coluna {tabela}.{coluna} adicionada.")
+
+        # Preenchimento das colunas recém-criadas com um UPDATE por coluna
+        # (subconsulta correlacionada, portável entre SQLite e MySQL; o GROUP BY
+        # é exigido pelo SQLite anterior ao 3.39 para usar HAVING); só
+        # vincula quando há exatamente um candidato. Roda só na execução que
+        # criou a coluna: no MySQL, se o UPDATE falhar depois do ALTER, o
+        # preenchimento não é refeito ao rodar o script de novo
+        if 'turno_id' in adicionadas:
+            turno_unico = db.select(db.func.min(ClienteTurno.id)).where(
+                ClienteTurno.cliente_id == Roteirizacao.cliente_id,
+                ClienteTurno.ativo == True
+            ).group_by(ClienteTurno.cliente_id).having(
+                db.func.count(ClienteTurno.id) == 1).scalar_subquery()
+            # atualizado_em mantido: o onupdate não deve marcar o backfill como edição
+            res = conn.execute(db.update(Roteirizacao.__table__).where(
+                Roteirizacao.turno_id.is_(None)).values(
+                turno_id=turno_unico, atualizado_em=Roteirizacao.atualizado_em))
+            print(f"  ~ roteirizacoes.turno_id preenchido ({res.rowcount} linhas avaliadas).")
+
+        if 'passageiro_base_id' in adicionadas:
+            base_unica = db.select(db.func.min(PassageiroBase.id)).where(
+                PassageiroBase.roteirizacao_vinculada_id == Passageiro.roteirizacao_id,
+                PassageiroBase.nome == Passageiro.nome
+            ).group_by(PassageiroBase.roteirizacao_vinculada_id, PassageiroBase.nome).having(
+                db.func.count(PassageiroBase.id) == 1).scalar_subquery()
+            res = conn.execute(db.update(Passageiro.__table__).where(
+                Passageiro.passageiro_base_id.is_(None)).values(passageiro_base_id=base_unica))
+            print(f"  ~ passageiros.passageiro_base_id preenchido ({res.rowcount} linhas avaliadas).")
 
     print("\nMigração concluída.")
@@ -1,4 +1,6 @@
-from datetime import datetime, timedelta, time, timezone
+from collections import namedtuple
+from datetime import date, datetime, timedelta, time, timezone
+from flask import g
 from flask_sqlalchemy import SQLAlchemy
 from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
@@ -24,6 +26,16 @@ HORA_INICIO = time(8, 0)   # 08:00
 HORA_FIM = time(17, 0)     # 17:00
 HORAS_POR_DIA = 9          # 9 horas úteis por dia
 
+# Mesmos limites em microssegundos desde a meia-noite, para contas só com inteiros
+_UM_MICROSSEGUNDO = timedelta(microseconds=1)
+_HORA_US = 3600 * 10**6
+_INICIO_US = (HORA_INICIO.hour * 60 + HORA_INICIO.minute) * 60 * 10**6
+_FIM_US = (HORA_FIM.hour * 60 + HORA_FIM.minute) * 60 * 10**6
+_EXPEDIENTE_US = HORAS_POR_DIA * _HORA_US
+
+# Dias até o próximo dia útil por weekday() (0=Segunda ... 6=Domingo)
+_DIAS_ATE_UTIL = (0, 0, 0, 0, 0, 2, 1)
+
 
 def eh_dia_util(dt):
     """Verifica se é dia útil (segunda a sexta)"""
@@ -38,11 +50,26 @@ def eh_horario_util(dt):
 def proximo_inicio_expediente(dt):
     """Retorna o próximo início de expediente a partir de dt"""
     # Se for fim de semana, avança para segunda
-    while not eh_dia_util(dt):
-        dt = dt + timedelta(days=1)
+    dias = _DIAS_ATE_UTIL[dt.weekday()]
+    if dias:
+        dt = dt + timedelta(days=dias)
     return dt.replace(hour=HORA_INICIO.hour, minute=HORA_INICIO.minute, second=0, microsecond=0)
 
 
+def _microssegundos_uteis_ate(dt):
+    """
+    Microssegundos de expediente acumulados desde 01/01/0001 (uma segunda-feira)
+    até dt. A diferença entre dois instantes é o tempo útil entre eles.
+    """
+    semanas, dia_semana = divmod(dt.toordinal() - 1, 7)
+    total = (semanas * 5 + min(dia_semana, 5)) * _EXPEDIENTE_US
+    if dia_semana < 5:
+        # Hora do dia em microssegundos inteiros, limitada ao expediente
+        us_do_dia = ((dt.hour * 60 + dt.minute) * 60 + dt.second) * 10**6 + dt.microsecond
+        total += min(max(us_do_dia, _INICIO_US), _FIM_US) - _INICIO_US
+    return total
+
+
 def adicionar_horas_uteis(dt, horas):
     """
     Adiciona horas úteis a uma data/hora considerando horário administrativo.
@@ -51,31 +78,17 @@ def adicionar_horas_uteis(dt, horas):
     if horas <= 0:
         return dt
 
-    # Se estiver fora do expediente, ajustar para próximo início
-    if not eh_dia_util(dt):
-        dt = proximo_inicio_expediente(dt)
-    elif dt.time() < HORA_INICIO:
-        dt = dt.replace(hour=HORA_INICIO.hour, minute=HORA_INICIO.minute, second=0, microsecond=0)
-    elif dt.time() >= HORA_FIM:
-        dt = proximo_inicio_expediente(dt + timedelta(days=1))
-
-    horas_restantes = horas
-
-    while horas_restantes > 0:
-        # Calcular horas disponíveis até o fim do expediente
-        fim_expediente = dt.replace(hour=HORA_FIM.hour, minute=HORA_FIM.minute, second=0, microsecond=0)
-        horas_ate_fim = (fim_expediente - dt).total_seconds() / 3600
+    # Posição final na "linha do tempo útil": n-ésimo dia útil + deslocamento no expediente
+    alvo = _microssegundos_uteis_ate(dt) + timedelta(hours=horas) // _UM_MICROSSEGUNDO
+    dias_uteis, deslocamento = divmod(alvo, _EXPEDIENTE_US)
+    if deslocamento == 0:
+        # Terminar exatamente no fim do expediente fica às 17:00 do dia, não às 08:00 do seguinte
+        dias_uteis -= 1
+        deslocamento = _EXPEDIENTE_US
 
-        if horas_restantes <= horas_ate_fim:
-            # Cabe no dia atual
-            dt = dt + timedelta(hours=horas_restantes)
-            horas_restantes = 0
-        else:
-            # Consome o resto do dia e avança
-            horas_restantes -= horas_ate_fim
-            dt = proximo_inicio_expediente(dt + timedelta(days=1))
-
-    return dt
+    semanas, dia_semana = divmod(dias_uteis, 5)
+    data = date.fromordinal(semanas * 7 + dia_semana + 1)
+    return datetime.combine(data, HORA_INICIO, tzinfo=dt.tzinfo) + timedelta(microseconds=deslocamento)
 
 
 def calcular_horas_uteis_entre(dt_inicio, dt_fim):
@@ -83,38 +96,9 @@ def calcular_horas_uteis_entre(dt_inicio, dt_fim):
     Calcula a quantidade de horas úteis entre duas datas.
     Retorna valor negativo se dt_fim < dt_inicio (SLA violado).
     """
-    if dt_fim <= dt_inicio:
-        # Calcular quanto tempo passou além do limite
-        return -calcular_horas_uteis_entre(dt_fim, dt_inicio)
-
-    horas = 0
-    dt = dt_inicio
-
-    # Ajustar início se fora do expediente
-    if not eh_dia_util(dt):
-        dt = proximo_inicio_expediente(dt)
-    elif dt.time() < HORA_INICIO:
-        dt = dt.replace(hour=HORA_INICIO.hour, minute=HORA_INICIO.minute, second=0, microsecond=0)
-    elif dt.time() >= HORA_FIM:
-        dt = proximo_inicio_expediente(dt + timedelta(days=1))
-
-    while dt < dt_fim:
-        if not eh_dia_util(dt):
-            dt = proximo_inicio_expediente(dt)
-            continue
-
-        fim_expediente = dt.replace(hour=HORA_FIM.hour, minute=HORA_FIM.minute, second=0, microsecond=0)
-
-        if dt_fim <= fim_expediente:
-            # Termina no mesmo dia
-            horas += (dt_fim - dt).total_seconds() / 3600
-            break
-        else:
-            # Conta até o fim do expediente e avança para o próximo dia
-            horas += (fim_expediente - dt).total_seconds() / 3600
-            dt = proximo_inicio_expediente(dt + timedelta(days=1))
-
-    return horas
+    # Contagem em forma fechada (semanas inteiras + pontas), sem percorrer dia a dia
+    return (_microssegundos_uteis_ate(dt_fim) - _microssegundos_uteis_ate(dt_inicio)) / _HORA_US
+
 
 class User(UserMixin, db.Model):
     __tablename__ = 'users'
@@ -139,7 +123,8 @@ class User(UserMixin, db.Model):
                                          foreign_keys='Ticket.atendente_id')
     historicos = db.relationship('TicketHistory', backref='usuario', lazy='dynamic')
     # Categorias que o atendente pode visualizar/atender
-    categorias = db.relationship('Category', secondary=atendente_categoria, lazy='dynamic',
+    # Coleção comum (não dynamic): carregada uma vez e consultada em memória
+    categorias = db.relationship('Category', secondary=atendente_categoria,
                                   backref=db.backref('atendentes', lazy='dynamic'))
     # Empresa vinculada (para SLA por cliente)
     cliente_empresa = db.relationship('Cliente', foreign_keys=[cliente_id])
@@ -169,13 +154,13 @@ class User(UserMixin, db.Model):
         if not self.is_atendente():
             return False
         # Se não tem categorias atribuídas, pode ver todas
-        if self.categorias.count() == 0:
+        if not self.categorias:
             return True
-        return self.categorias.filter_by(id=categoria_id).first() is not None
+        return any(c.id == categoria_id for c in self.categorias)
 
     def get_categorias_ids(self):
         """Retorna lista de IDs das categorias do atendente"""
-        return [c.id for c in self.categorias.all()]
+        return [c.id for c in self.categorias]
 
     def __repr__(self):
         return f'<User {self.email}>'
@@ -195,6 +180,19 @@ class Category(db.Model):
         return f'<Category {self.nome}>'
 
 
+# Tempos de SLA (horas úteis) de uma prioridade
+SLA = namedtuple('SLA', 'tempo_resposta_horas tempo_resolucao_horas')
+
+# Padrões usados quando a prioridade não tem configuração (montados uma vez)
+_SLA_PADRAO = {
+    'critica': SLA(1, 4),
+    'alta': SLA(2, 8),
+    'media': SLA(4, 24),
+    'baixa': SLA(8, 48),
+}
+_SLA_FALLBACK = SLA(8, 48)
+
+
 class SLAConfig(db.Model):
     __tablename__ = 'sla_configs'
 
@@ -205,23 +203,44 @@ class SLAConfig(db.Model):
 
     @staticmethod
     def get_sla(prioridade):
-        sla = SLAConfig.query.filter_by(prioridade=prioridade).first()
+        sla = SLAConfig.slas_em_cache().get(prioridade)
         if sla:
             return sla
         # Default values
-        defaults = {
-            'critica': (1, 4),
-            'alta': (2, 8),
-            'media': (4, 24),
-            'baixa': (8, 48)
-        }
-        resp, resol = defaults.get(prioridade, (8, 48))
-        return type('SLA', (), {'tempo_resposta_horas': resp, 'tempo_resolucao_horas': resol})()
+        return _SLA_PADRAO.get(prioridade, _SLA_FALLBACK)
+
+    @staticmethod
+    def slas_em_cache():
+        """
+        Retorna {prioridade: SLA} das configurações globais, lidas uma vez por
+        requisição (cache no g): nunca reaproveita valores de outro worker.
+        """
+        slas = g.get('_slas_config')
+        if slas is None:
+            slas = g._slas_config = {
+                prioridade: SLA(resposta, resolucao)
+                for prioridade, resposta, resolucao in db.session.query(
+                    SLAConfig.prioridade, SLAConfig.tempo_resposta_horas, SLAConfig.tempo_resolucao_horas
+                )
+            }
+        return slas
+
+    @classmethod
+    def invalidar_cache(cls):
+        """Descarta o cache de SLAs; a próxima consulta relê a tabela"""
+        g.pop('_slas_config', None)
 
     def __repr__(self):
         return f'<SLAConfig {self.prioridade}>'
 
 
+@db.event.listens_for(SLAConfig, 'after_insert')
+@db.event.listens_for(SLAConfig, 'after_update')
+@db.event.listens_for(SLAConfig, 'after_delete')
+def _invalidar_cache_sla(mapper, connection, target):
+    SLAConfig.invalidar_cache()
+
+
 class SLACliente(db.Model):
     """SLA personalizado por empresa cliente"""
     __tablename__ = 'sla_clientes'
@@ -253,8 +272,7 @@ class SLACliente(db.Model):
             'media': (self.media_resposta_horas, self.media_resolucao_horas),
             'baixa': (self.baixa_resposta_horas, self.baixa_resolucao_horas),
         }
-        resp, resol = mapping.get(prioridade, (8, 48))
-        return type('SLA', (), {'tempo_resposta_horas': resp, 'tempo_resolucao_horas': resol})()
+        return SLA(*mapping.get(prioridade, _SLA_FALLBACK))
 
     def __repr__(self):
         return f'<SLACliente {self.cliente.nome if self.cliente else self.cliente_id}>'
@@ -262,6 +280,12 @@ class SLACliente(db.Model):
 
 class Ticket(db.Model):
     __tablename__ = 'tickets'
+    __table_args__ = (
+        # Painéis: status IN (...) + faixa de sla_resolucao_limite
+        db.Index('ix_tickets_status_sla_resolucao', 'status', 'sla_resolucao_limite'),
+        # Visão do cliente: cliente_id + status
+        db.Index('ix_tickets_cliente_status', 'cliente_id', 'status'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     titulo = db.Column(db.String(200), nullable=False)
@@ -315,17 +339,17 @@ class Ticket(db.Model):
                 return sla_cliente.cliente.nome
         return None
 
-    def sla_resposta_status(self):
+    def sla_resposta_status(self, agora=None):
         """Verifica status do SLA de resposta considerando horas úteis"""
         if not self.sla_resposta_limite:
             return 'pendente'
         if self.primeira_resposta_em:
             return 'ok' if self.primeira_resposta_em <= self.sla_resposta_limite else 'violado'
-        if agora_brasil() > self.sla_resposta_limite:
+        if (agora or agora_brasil()) > self.sla_resposta_limite:
             return 'violado'
         return 'pendente'
 
-    def sla_resolucao_status(self):
+    def sla_resolucao_status(self, agora=None):
         """Verifica status do SLA de resolução considerando horas úteis"""
         if not self.sla_resolucao_limite:
             return 'pendente'
@@ -333,17 +357,36 @@ class Ticket(db.Model):
         data_conclusao = self.fechado_em or self.resolvido_em
         if data_conclusao:
             return 'ok' if data_conclusao <= self.sla_resolucao_limite else 'violado'
-        if agora_brasil() > self.sla_resolucao_limite:
+        if (agora or agora_brasil()) > self.sla_resolucao_limite:
             return 'violado'
         return 'pendente'
 
-    def horas_uteis_restantes(self):
+    def horas_uteis_restantes(self, agora=None):
         """Retorna as horas úteis restantes até o SLA de resolução"""
         if not self.sla_resolucao_limite:
             return 0
         if self.resolvido_em:
             return 0
-        return max(0, calcular_horas_uteis_entre(agora_brasil(), self.sla_resolucao_limite))
+        return max(0, calcular_horas_uteis_entre(agora or agora_brasil(), self.sla_resolucao_limite))
+
+    @classmethod
+    def expressoes_status_sla(cls, agora=None):
+        """Expressões CASE (resposta, resolução) equivalentes a sla_*_status, avaliadas no banco"""
+        agora = agora or agora_brasil()
+        conclusao = db.func.coalesce(cls.fechado_em, cls.resolvido_em)
+        resposta = db.case(
+            (cls.sla_resposta_limite.is_(None), 'pendente'),
+            (cls.primeira_resposta_em.isnot(None) & (cls.primeira_resposta_em <= cls.sla_resposta_limite), 'ok'),
+            (cls.primeira_resposta_em.isnot(None), 'violado'),
+            (cls.sla_resposta_limite < agora, 'violado'),
+            else_='pendente')
+        resolucao = db.case(
+            (cls.sla_resolucao_limite.is_(None), 'pendente'),
+            (conclusao.isnot(None) & (conclusao <= cls.sla_resolucao_limite), 'ok'),
+            (conclusao.isnot(None), 'violado'),
+            (cls.sla_resolucao_limite < agora, 'violado'),
+            else_='pendente')
+        return resposta, resolucao
 
     def tempo_total_atendimento(self):
         """Retorna tempo total de atendimento em minutos"""
@@ -351,12 +394,24 @@ class Ticket(db.Model):
             db.func.sum(TicketHistory.tempo_gasto_minutos)
         ).filter(TicketHistory.ticket_id == self.id).scalar() or 0
 
+    @staticmethod
+    def tempo_total_atendimento_em_lote(ticket_ids):
+        """Retorna {ticket_id: minutos} de vários chamados numa única consulta agrupada"""
+        if not ticket_ids:
+            return {}
+        return dict(db.session.query(
+            TicketHistory.ticket_id, db.func.sum(TicketHistory.tempo_gasto_minutos)
+        ).filter(TicketHistory.ticket_id.in_(ticket_ids)).group_by(TicketHistory.ticket_id).all())
+
     def __repr__(self):
         return f'<Ticket #{self.id} - {self.titulo}>'
 
 
 class TicketHistory(db.Model):
     __tablename__ = 'ticket_history'
+    __table_args__ = (
+        db.Index('ix_ticket_history_ticket_id', 'ticket_id'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     ticket_id = db.Column(db.Integer, db.ForeignKey('tickets.id'), nullable=False)
@@ -582,7 +637,8 @@ class Rota(db.Model):
     atualizado_em = db.Column(db.DateTime, default=agora_brasil, onupdate=agora_brasil)
 
     # Relacionamentos
-    turnos = db.relationship('RotaTurno', backref='rota', lazy='dynamic',
+    # Poucos turnos por rota, sempre lidos inteiros: coleção comum (aceita selectinload)
+    turnos = db.relationship('RotaTurno', backref='rota',
                              order_by='RotaTurno.horario_inicio')
     historicos = db.relationship('RotaHistory', backref='rota', lazy='dynamic',
                                   order_by='RotaHistory.criado_em.desc()')
@@ -625,6 +681,10 @@ class RotaTurno(db.Model):
 class RotaHistory(db.Model):
     """Histórico de alterações em rotas"""
     __tablename__ = 'rota_history'
+    __table_args__ = (
+        # rota.historicos: rota_id ordenado por criado_em desc
+        db.Index('ix_rota_history_rota_criado', 'rota_id', 'criado_em'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     rota_id = db.Column(db.Integer, db.ForeignKey('rotas.id'), nullable=False)
@@ -649,6 +709,10 @@ class RotaHistory(db.Model):
 class Auditoria(db.Model):
     """Registro de auditorias realizadas em rotas"""
     __tablename__ = 'auditorias'
+    __table_args__ = (
+        # rota.auditorias: rota_id ordenado por criado_em desc
+        db.Index('ix_auditorias_rota_criado', 'rota_id', 'criado_em'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     rota_id = db.Column(db.Integer, db.ForeignKey('rotas.id'), nullable=False)
@@ -716,6 +780,10 @@ class CombustivelAnalise(db.Model):
 class CombustivelRegistro(db.Model):
     """Registros individuais de abastecimento"""
     __tablename__ = 'combustivel_registros'
+    __table_args__ = (
+        # Registros e alertas de uma análise: analise_id + alerta
+        db.Index('ix_combustivel_registros_analise_alerta', 'analise_id', 'alerta'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     analise_id = db.Column(db.Integer, db.ForeignKey('combustivel_analises.id'), nullable=False)
@@ -776,7 +844,7 @@ class IndicadorCategoria(db.Model):
     ativo = db.Column(db.Boolean, default=True)
     criado_em = db.Column(db.DateTime, default=agora_brasil)
 
-    indicadores = db.relationship('Indicador', backref='categoria', lazy='dynamic',
+    indicadores = db.relationship('Indicador', backref='categoria',
                                   order_by='Indicador.ordem')
 
     def __repr__(self):
@@ -805,6 +873,10 @@ class Indicador(db.Model):
 
 class IndicadorRegistro(db.Model):
     __tablename__ = 'indicador_registro'
+    __table_args__ = (
+        # Registro do mês de um indicador e histórico por mes_referencia desc
+        db.Index('ix_indicador_registro_indicador_mes', 'indicador_id', 'mes_referencia'),
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     indicador_id = db.Column(db.Integer, db.ForeignKey('indicador.id'), nullable=False)
@@ -1052,3 +1124,17 @@ class RoteiroPlanejado(db.Model):
 
     def __repr__(self):
         return f'<RoteiroPlanejado {self.nome}>'
+
+
+class GeocodeCache(db.Model):
+    """Resultado de geocodificação (Google) por endereço normalizado, reaproveitado entre importações"""
+    __tablename__ = 'geocode_cache'
+
+    endereco_normalizado = db.Column(db.String(500), primary_key=True)
+    lat = db.Column(db.Float, nullable=False)
+    lng = db.Column(db.Float, nullable=False)
+    endereco_formatado = db.Column(db.String(500))
+    criado_em = db.Column(db.DateTime, default=agora_brasil)
+
+    def __repr__(self):
+        return f'<GeocodeCache {self.endereco_normalizado}>'
@@ -7,9 +7,14 @@ import csv
 import io
 import os
 import math
+import re
+import threading
 import time
-import requests
+import unicodedata
+from collections import Counter
+from itertools import chain
 from datetime import datetime, timedelta
+from functools import lru_cache
 
 # Reutiliza haversine do kml_utils existente
 from kml_utils import haversine
@@ -19,6 +24,17 @@ import calendar
 
 GOOGLE_MAPS_API_KEY = None  # Será setado pelo app via init_api_key()
 
+# Geocodificação em lote: requisições simultâneas e intervalo mínimo entre
+# inícios de requisição (abaixo do limite de 50 QPS da Geocoding API)
+GEOCODE_WORKERS = 10
+GEOCODE_INTERVALO = 0.025
+
+# Caches em memória (por processo) das geocodificações com sucesso, direta e
+# reversa; o cache persistente fica na tabela GeocodeCache
+GEOCODE_MEMO_MAX = 4096
+_geocode_memo = {}
+_reverse_memo = {}
+
 
 def _prox_dia_util_timestamp(horario):
     """
@@ -42,6 +58,26 @@ def init_api_key(key):
     GOOGLE_MAPS_API_KEY = key
 
 
+_sessao_http = None
+
+
+def _google_get(url, **kwargs):
+    """
+    GET nas APIs do Google. Importa requests só na primeira chamada (fora do boot dos workers)
+    e reaproveita uma Session com pool de conexões (TCP/TLS mantidos entre chamadas e threads).
+    Sem repetições no adaptador: as novas tentativas ficam só nos laços de quem chama.
+    """
+    global _sessao_http
+    if _sessao_http is None:
+        import requests
+        from requests.adapters import HTTPAdapter
+        sessao = requests.Session()
+        adaptador = HTTPAdapter(pool_connections=GEOCODE_WORKERS * 2, pool_maxsize=GEOCODE_WORKERS * 2)
+        sessao.mount('https://', adaptador)
+        _sessao_http = sessao
+    return _sessao_http.get(url, **kwargs)
+
+
 # ============================================
 # IMPORTAÇÃO DE ARQUIVO CSV/XLSX
 # ============================================
@@ -60,19 +96,16 @@ def parse_arquivo_passageiros(filepath):
         return _parse_csv(filepath)
 
 
+# Acentos removidos dos nomes de coluna, numa única passada de str.translate
+_TABELA_ACENTOS = str.maketrans('áàãâéêíóôõúç', 'aaaaeeiooouc')
+
+
+@lru_cache(maxsize=256)
 def _normalize_col(name):
     """Normaliza nome de coluna removendo acentos e padronizando."""
     if not name:
         return ''
-    name = name.strip().lower()
-    replacements = {
-        'á': 'a', 'à': 'a', 'ã': 'a', 'â': 'a',
-        'é': 'e', 'ê': 'e', 'í': 'i', 'ó': 'o',
-        'ô': 'o', 'õ': 'o', 'ú': 'u', 'ç': 'c',
-    }
-    for old, new in replacements.items():
-        name = name.replace(old, new)
-    return name
+    return name.strip().lower().translate(_TABELA_ACENTOS)
 
 
 # Mapeamento de nomes de coluna para campos
@@ -89,6 +122,10 @@ COL_MAP = {
     'observacoes': 'observacoes', 'obs': 'observacoes', 'observacao': 'observacoes',
 }
 
+# Campos de passageiro produzidos pela importação, na ordem do cadastro
+CAMPOS_PASSAGEIRO = ('nome', 'endereco', 'numero', 'bairro', 'cidade', 'estado', 'cep',
+                     'complemento', 'telefone', 'observacoes')
+
 
 def _map_columns(headers):
     """Mapeia headers do arquivo para campos do sistema."""
@@ -172,19 +209,22 @@ def _parse_xlsx(filepath):
         wb = load_workbook(filepath, read_only=True, data_only=True)
         ws = wb.active
 
-        rows = list(ws.iter_rows(values_only=True))
-        if len(rows) < 2:
+        # Linhas lidas do iterador sob demanda, sem materializar a planilha inteira
+        linhas = ws.iter_rows(values_only=True)
+        cabecalho = next(linhas, None)
+        primeira = next(linhas, None)
+        if cabecalho is None or primeira is None:
             return {'passageiros': [], 'total': 0, 'erros': ['Planilha vazia ou sem dados.']}
 
-        headers = [str(c) if c else '' for c in rows[0]]
+        headers = [str(c) if c else '' for c in cabecalho]
         col_mapping = _map_columns(headers)
 
         if 'nome' not in col_mapping.values():
             return {'passageiros': [], 'total': 0, 'erros': ['Coluna "nome" não encontrada na planilha.']}
 
-        for i, row in enumerate(rows[1:], start=2):
+        for i, row in enumerate(chain((primeira,), linhas), start=2):
             try:
-                p = _row_to_passageiro(list(row), col_mapping)
+                p = _row_to_passageiro(row, col_mapping)
                 if p.get('nome'):
                     passageiros.append(p)
                 else:
@@ -203,16 +243,108 @@ def _parse_xlsx(filepath):
 # GEOCODIFICAÇÃO VIA GOOGLE MAPS
 # ============================================
 
+_RE_NAO_ALFANUM = re.compile(r'[^a-z0-9]+')
+
+
+def _normalizar_endereco(endereco):
+    """Chave de cache do endereço: minúsculas, sem acentos nem pontuação, espaços simples."""
+    sem_acento = unicodedata.normalize('NFKD', (endereco or '').lower()).encode('ascii', 'ignore').decode('ascii')
+    return ' '.join(_RE_NAO_ALFANUM.sub(' ', sem_acento).split())[:500]
+
+
+def _memo_guardar(memo, chave, valor):
+    """Guarda um valor num cache em memória limitado, descartando o mais antigo se cheio."""
+    if not chave:
+        return
+    if len(memo) >= GEOCODE_MEMO_MAX:
+        try:
+            memo.pop(next(iter(memo)))
+        except (StopIteration, KeyError, RuntimeError):
+            pass
+    memo[chave] = valor
+
+
+def _consultar_em_paralelo(funcao, pendentes, delay, workers):
+    """
+    Chama funcao(*args) para cada {chave: args} de pendentes com até `workers` threads,
+    com no mínimo `delay` segundos entre o início de cada chamada.
+    Gera (chave, resultado) na ordem de conclusão.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+
+    if not pendentes:
+        return
+    trava = threading.Lock()
+    proximo_inicio = [time.monotonic()]
+
+    def _chamar(args):
+        # Reserva o próximo horário livre e espera fora da trava
+        with trava:
+            inicio = max(proximo_inicio[0], time.monotonic())
+            proximo_inicio[0] = inicio + delay
+        espera = inicio - time.monotonic()
+        if espera > 0:
+            time.sleep(espera)
+        return funcao(*args)
+
+    with ThreadPoolExecutor(max_workers=max(1, min(workers, len(pendentes)))) as executor:
+        futuros = {executor.submit(_chamar, args): chave for chave, args in pendentes.items()}
+        for futuro in as_completed(futuros):
+            yield futuros[futuro], futuro.result()
+
+
+def _cache_banco_ler(chaves):
+    """Resultados gravados em GeocodeCache para as chaves (vazio fora de um app context)."""
+    from flask import has_app_context
+    chaves = [c for c in chaves if c]
+    if not chaves or not has_app_context():
+        return {}
+    from models import db, GeocodeCache
+    linhas = db.session.execute(db.select(
+        GeocodeCache.endereco_normalizado, GeocodeCache.lat, GeocodeCache.lng, GeocodeCache.endereco_formatado
+    ).where(GeocodeCache.endereco_normalizado.in_(chaves)))
+    return {chave: {'lat': lat, 'lng': lng, 'endereco_formatado': formatado or '', 'status': 'sucesso'}
+            for chave, lat, lng, formatado in linhas}
+
+
+def _cache_banco_gravar(resultados):
+    """
+    Grava {chave: resultado} de sucesso em GeocodeCache na transação da sessão atual
+    (o commit fica com quem chamou). Chaves já existentes são ignoradas pelo banco.
+    """
+    from flask import has_app_context
+    linhas = [{'endereco_normalizado': chave, 'lat': r['lat'], 'lng': r['lng'],
+               'endereco_formatado': r['endereco_formatado']}
+              for chave, r in resultados.items() if chave and r['status'] == 'sucesso']
+    if not linhas or not has_app_context():
+        return
+    from models import db, GeocodeCache
+    stmt = db.insert(GeocodeCache).prefix_with('OR IGNORE', dialect='sqlite').prefix_with('IGNORE', dialect='mysql')
+    db.session.execute(stmt, linhas)
+
+
 def geocode_endereco(endereco_completo):
     """
-    Geocodifica um endereço via Google Geocoding API.
+    Geocodifica um endereço, consultando antes o cache em memória e a tabela GeocodeCache.
     Retorna: {'lat': float, 'lng': float, 'endereco_formatado': str, 'status': str}
     """
+    chave = _normalizar_endereco(endereco_completo)
+    resultado = _geocode_memo.get(chave) or _cache_banco_ler([chave]).get(chave)
+    if resultado is None:
+        resultado = _geocode_google(endereco_completo)
+        _cache_banco_gravar({chave: resultado})
+    if resultado['status'] == 'sucesso':
+        _memo_guardar(_geocode_memo, chave, resultado)
+    return dict(resultado)
+
+
+def _geocode_google(endereco_completo):
+    """Geocodifica um endereço via Google Geocoding API (sem cache)."""
     if not GOOGLE_MAPS_API_KEY:
         return {'lat': None, 'lng': None, 'endereco_formatado': '', 'status': 'erro_config'}
 
     try:
-        resp = requests.get(
+        resp = _google_get(
             'https://maps.googleapis.com/maps/api/geocode/json',
             params={
                 'address': endereco_completo + ', Brasil',
@@ -241,28 +373,104 @@ def geocode_endereco(endereco_completo):
         return {'lat': None, 'lng': None, 'endereco_formatado': '', 'status': 'falha'}
 
 
-def geocode_lote(passageiros_data, delay=0.1):
+def geocode_lote(passageiros_data, delay=GEOCODE_INTERVALO, workers=GEOCODE_WORKERS, progresso=None):
     """
-    Geocodifica uma lista de passageiros em lote.
+    Geocodifica uma lista de passageiros em lote. Endereços já em cache (memória ou
+    GeocodeCache) não vão ao Google; os demais são consultados uma vez cada, com até
+    `workers` requisições simultâneas e no mínimo `delay` segundos entre o início de cada uma.
     passageiros_data: lista de dicts com 'endereco_completo' e 'id'
-    Retorna: lista de resultados com id e dados geocodificados
+    progresso: callback opcional progresso(concluidos, total)
+    Retorna: lista de resultados com id e dados geocodificados (na ordem da entrada)
     """
-    resultados = []
-    for p in passageiros_data:
-        resultado = geocode_endereco(p['endereco_completo'])
-        resultado['id'] = p['id']
-        resultados.append(resultado)
-        if delay > 0:
-            time.sleep(delay)
-    return resultados
+    total = len(passageiros_data)
+    chaves = [_normalizar_endereco(p['endereco_completo']) for p in passageiros_data]
+    resolvidos = {c: _geocode_memo[c] for c in set(chaves) if c in _geocode_memo}
+    resolvidos.update(_cache_banco_ler([c for c in set(chaves) if c not in resolvidos]))
+
+    # Um endereço por chave ainda não resolvida
+    pendentes = {}
+    for p, chave in zip(passageiros_data, chaves):
+        if chave not in resolvidos:
+            pendentes.setdefault(chave, (p['endereco_completo'],))
+    por_chave = Counter(chaves)
+    concluidos = total - sum(por_chave[c] for c in pendentes)
+    if progresso and concluidos:
+        progresso(concluidos, total)
+
+    novos = {}
+    for chave, resultado in _consultar_em_paralelo(_geocode_google, pendentes, delay, workers):
+        resolvidos[chave] = novos[chave] = resultado
+        if resultado['status'] == 'sucesso':
+            _memo_guardar(_geocode_memo, chave, resultado)
+        concluidos += por_chave[chave]
+        if progresso:
+            progresso(concluidos, total)
+    # Gravação no banco nesta thread (a sessão não é compartilhada com o pool)
+    _cache_banco_gravar(novos)
+
+    return [dict(resolvidos[chave], id=p['id']) for p, chave in zip(passageiros_data, chaves)]
+
+
+def _chave_reversa(lat, lng):
+    """Chave de cache da geocodificação reversa: coordenadas arredondadas a 5 casas (~1 m)."""
+    return f'latlng:{lat:.5f},{lng:.5f}'
 
 
 def reverse_geocode(lat, lng):
-    """Geocodificação reversa para obter endereço de referência de um ponto."""
+    """
+    Geocodificação reversa para obter endereço de referência de um ponto, consultando
+    antes o cache em memória e a tabela GeocodeCache (por coordenada arredondada).
+    """
+    return reverse_geocode_lote([(lat, lng)])[0]
+
+
+def reverse_geocode_lote(pontos, delay=GEOCODE_INTERVALO, workers=GEOCODE_WORKERS, progresso=None):
+    """
+    Geocodificação reversa de vários pontos [(lat, lng), ...]. Pontos que arredondam para
+    a mesma coordenada são consultados uma vez; os que faltam no cache vão ao Google em
+    paralelo, com o mesmo limite de taxa de geocode_lote.
+    progresso: callback opcional progresso(concluidos, total)
+    Retorna a lista de endereços na ordem da entrada.
+    """
+    chaves = [_chave_reversa(lat, lng) for lat, lng in pontos]
+    resolvidos = {c: _reverse_memo[c] for c in set(chaves) if c in _reverse_memo}
+    resolvidos.update((c, r['endereco_formatado']) for c, r in
+                      _cache_banco_ler([c for c in set(chaves) if c not in resolvidos]).items())
+
+    pendentes = {}
+    for ponto, chave in zip(pontos, chaves):
+        if chave not in resolvidos:
+            pendentes.setdefault(chave, ponto)
+    total = len(pontos)
+    por_chave = Counter(chaves)
+    concluidos = total - sum(por_chave[c] for c in pendentes)
+    if progresso and concluidos:
+        progresso(concluidos, total)
+
+    novos = {}
+    for chave, endereco in _consultar_em_paralelo(_reverse_geocode_google, pendentes, delay, workers):
+        resolvidos[chave] = endereco
+        if endereco:
+            _memo_guardar(_reverse_memo, chave, endereco)
+            lat, lng = pendentes[chave]
+            novos[chave] = {'lat': round(lat, 5), 'lng': round(lng, 5),
+                            'endereco_formatado': endereco, 'status': 'sucesso'}
+        concluidos += por_chave[chave]
+        if progresso:
+            progresso(concluidos, total)
+    _cache_banco_gravar(novos)
+
+    # Falha na API: coordenadas do próprio ponto como referência
+    return [f'{lat:.6f}, {lng:.6f}' if resolvidos[chave] is None else resolvidos[chave]
+            for (lat, lng), chave in zip(pontos, chaves)]
+
+
+def _reverse_geocode_google(lat, lng):
+    """Geocodificação reversa via Google (sem cache). '' sem chave de API, None em caso de falha."""
     if not GOOGLE_MAPS_API_KEY:
         return ''
     try:
-        resp = requests.get(
+        resp = _google_get(
             'https://maps.googleapis.com/maps/api/geocode/json',
             params={
                 'latlng': f'{lat},{lng}',
@@ -277,7 +485,7 @@ def reverse_geocode(lat, lng):
             return data['results'][0]['formatted_address']
     except Exception:
         pass
-    return f'{lat:.6f}, {lng:.6f}'
+    return None
 
 
 # ============================================
@@ -364,7 +572,7 @@ def _obter_rota_tronco(passageiros, destino_lat, destino_lng, departure_timestam
         params['traffic_model'] = 'best_guess'
 
     try:
-        resp = requests.get(url, params=params, timeout=30)
+        resp = _google_get(url, params=params, timeout=30)
         data = resp.json()
         if data.get('status') == 'OK' and data.get('routes'):
             encoded = data['routes'][0]['overview_polyline']['points']
@@ -680,7 +888,7 @@ def _directions_request(paradas, destino_lat, destino_lng, departure_timestamp=N
         # Retry com backoff para rate limiting
         max_retries = 3
         for attempt in range(max_retries):
-            resp = requests.get(
+            resp = _google_get(
                 'https://maps.googleapis.com/maps/api/directions/json',
                 params=params,
                 timeout=30
@@ -696,7 +904,7 @@ def _directions_request(paradas, destino_lat, destino_lng, departure_timestamp=N
                 # Fallback: tentar sem departure_time (pode ser data passada)
                 params_sem_traffic = {k: v for k, v in params.items()
                                       if k not in ('departure_time', 'traffic_model')}
-                resp = requests.get(
+                resp = _google_get(
                     'https://maps.googleapis.com/maps/api/directions/json',
                     params=params_sem_traffic,
                     timeout=30
@@ -908,7 +1116,7 @@ def otimizar_rota_google_volta(paradas, origem_lat, origem_lng, departure_timest
         # Retry com backoff para rate limiting
         max_retries = 3
         for attempt in range(max_retries):
-            resp = requests.get(
+            resp = _google_get(
                 'https://maps.googleapis.com/maps/api/directions/json',
                 params=params,
                 timeout=30
@@ -924,7 +1132,7 @@ def otimizar_rota_google_volta(paradas, origem_lat, origem_lng, departure_timest
                 # Fallback: tentar sem departure_time
                 params_sem_traffic = {k: v for k, v in params.items()
                                       if k not in ('departure_time', 'traffic_model')}
-                resp = requests.get(
+                resp = _google_get(
                     'https://maps.googleapis.com/maps/api/directions/json',
                     params=params_sem_traffic,
                     timeout=30
@@ -1,6 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, send_from_directory
 from flask_login import login_required, current_user
 from functools import wraps
+from operator import attrgetter
 from werkzeug.utils import secure_filename
 from datetime import datetime
 import uuid
@@ -23,7 +24,7 @@ def auditoria_required(f):
         if not categoria_auditoria:
             flash('Módulo de auditoria não configurado.', 'danger')
             return redirect(url_for('index'))
-        if categoria_auditoria not in current_user.categorias.all():
+        if categoria_auditoria not in current_user.categorias:
             flash('Acesso restrito ao módulo de auditoria.', 'danger')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -40,7 +41,7 @@ def combustivel_required(f):
         if not categoria:
             flash('Módulo de combustível não configurado.', 'danger')
             return redirect(url_for('index'))
-        if categoria not in current_user.categorias.all():
+        if categoria not in current_user.categorias:
             flash('Acesso restrito ao módulo de combustível.', 'danger')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -53,6 +54,26 @@ def allowed_kml_file(filename):
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_KML_EXTENSIONS
 
 
+def _query_rotas_listagem():
+    """Consulta de rotas para listagens, com cliente e modal carregados no mesmo SELECT"""
+    return Rota.query.options(db.joinedload(Rota.cliente), db.joinedload(Rota.modal))
+
+
+def _query_auditorias_listagem():
+    """Consulta de auditorias para listagens, com rota, cliente da rota e atendente já carregados"""
+    return Auditoria.query.options(
+        db.joinedload(Auditoria.rota).joinedload(Rota.cliente),
+        db.joinedload(Auditoria.atendente)
+    )
+
+
+# Campos de RegistroCombustivel gravados em CombustivelRegistro
+_CAMPOS_REGISTRO_COMBUSTIVEL = ('prefixo', 'data', 'hora', 'tanque', 'bomba', 'litros',
+                                'hodometro_inicio', 'hodometro_fim', 'km', 'km_acumulado',
+                                'kml', 'modelo', 'garagem', 'flag')
+_valores_registro_combustivel = attrgetter(*_CAMPOS_REGISTRO_COMBUSTIVEL)
+
+
 def registrar_historico_rota(rota_id, usuario_id, acao, descricao, valor_anterior=None, valor_novo=None):
     """Registra entrada no histórico da rota"""
     historico = RotaHistory(
@@ -186,7 +207,7 @@ def lista_rotas():
     page = request.args.get('page', 1, type=int)
     per_page = 20
 
-    query = Rota.query
+    query = _query_rotas_listagem()
 
     # Filtros
     tag = request.args.get('tag', '').strip()
@@ -205,11 +226,18 @@ def lista_rotas():
 
     rotas = query.order_by(Rota.tag).paginate(page=page, per_page=per_page, error_out=False)
 
+    # Turnos ativos das rotas da página numa única contagem agrupada
+    turnos_ativos = dict(db.session.query(RotaTurno.rota_id, db.func.count(RotaTurno.id)).filter(
+        RotaTurno.rota_id.in_([r.id for r in rotas.items]),
+        RotaTurno.ativo == True
+    ).group_by(RotaTurno.rota_id).all()) if rotas.items else {}
+
     clientes = Cliente.query.filter_by(ativo=True).order_by(Cliente.nome).all()
     modais = Modal.query.filter_by(ativo=True).order_by(Modal.nome).all()
 
     return render_template('auditoria/rotas/list.html',
                            rotas=rotas,
+                           turnos_ativos=turnos_ativos,
                            clientes=clientes,
                            modais=modais)
 
@@ -342,7 +370,7 @@ def criar_rota():
 @auditoria_required
 def visualizar_rota(id):
     rota = Rota.query.get_or_404(id)
-    turnos = rota.turnos.filter_by(ativo=True).all()
+    turnos = [t for t in rota.turnos if t.ativo]
     historicos = rota.historicos.limit(50).all()
     auditorias = rota.auditorias.limit(10).all()
 
@@ -370,7 +398,7 @@ def editar_rota(id):
         if nova_tag and nova_tag != rota.tag:
             if Rota.query.filter(Rota.tag == nova_tag, Rota.id != rota.id).first():
                 flash('Já existe uma rota com esta tag.', 'danger')
-                turno = rota.turnos.filter_by(ativo=True).first()
+                turno = next((t for t in rota.turnos if t.ativo), None)
                 return render_template('auditoria/rotas/form.html',
                                        rota=rota,
                                        turno=turno,
@@ -461,7 +489,7 @@ def editar_rota(id):
         # Atualizar turno
         turno_inicio_str = request.form.get('turno_inicio', '').strip()
         turno_termino_str = request.form.get('turno_termino', '').strip()
-        turno_existente = rota.turnos.filter_by(ativo=True).first()
+        turno_existente = next((t for t in rota.turnos if t.ativo), None)
 
         if turno_inicio_str and turno_termino_str:
             try:
@@ -508,7 +536,7 @@ def editar_rota(id):
         return redirect(url_for('auditoria.visualizar_rota', id=rota.id))
 
     # Obter turno existente para o formulário
-    turno = rota.turnos.filter_by(ativo=True).first()
+    turno = next((t for t in rota.turnos if t.ativo), None)
 
     return render_template('auditoria/rotas/form.html',
                            rota=rota,
@@ -749,7 +777,7 @@ def lista_auditorias():
     page = request.args.get('page', 1, type=int)
     per_page = 20
 
-    query = Auditoria.query
+    query = _query_auditorias_listagem()
 
     # Filtros
     rota_id = request.args.get('rota_id', type=int)
@@ -803,7 +831,7 @@ def relatorios():
     data_inicio = request.args.get('data_inicio', '')
     data_fim = request.args.get('data_fim', '')
 
-    query = Auditoria.query
+    query = _query_auditorias_listagem()
 
     if cliente_id:
         query = query.join(Rota).filter(Rota.cliente_id == cliente_id)
@@ -840,7 +868,7 @@ def exportar_relatorio():
     data_inicio = request.form.get('data_inicio', '')
     data_fim = request.form.get('data_fim', '')
 
-    query = Auditoria.query
+    query = _query_auditorias_listagem()
 
     if cliente_id:
         query = query.join(Rota).filter(Rota.cliente_id == cliente_id)
@@ -1004,32 +1032,16 @@ def combustivel_upload():
             descricoes = ' | '.join(p['descricao'] for p in alerta['problemas'])
             alertas_por_indice[idx] = (tipos, descricoes)
 
-        # Salvar registros
+        # Salvar registros num único INSERT em lote (executemany), sem um objeto ORM por linha
+        linhas = []
         for idx, r in enumerate(registros):
-            tem_alerta = idx in alertas_por_indice
-            tipo_alerta, desc_alerta = alertas_por_indice.get(idx, ('', ''))
-
-            reg = CombustivelRegistro(
-                analise_id=analise.id,
-                prefixo=r['prefixo'],
-                data=r['data'],
-                hora=r['hora'],
-                tanque=r['tanque'],
-                bomba=r['bomba'],
-                litros=r['litros'],
-                hodometro_inicio=r['hodometro_inicio'],
-                hodometro_fim=r['hodometro_fim'],
-                km=r['km'],
-                km_acumulado=r['km_acumulado'],
-                kml=r['kml'],
-                modelo=r['modelo'],
-                garagem=r['garagem'],
-                flag=r['flag'],
-                alerta=tem_alerta,
-                tipo_alerta=tipo_alerta if tem_alerta else None,
-                descricao_alerta=desc_alerta if tem_alerta else None,
-            )
-            db.session.add(reg)
+            linha = dict(zip(_CAMPOS_REGISTRO_COMBUSTIVEL, _valores_registro_combustivel(r)))
+            alerta = alertas_por_indice.get(idx)
+            linha['analise_id'] = analise.id
+            linha['alerta'] = alerta is not None
+            linha['tipo_alerta'], linha['descricao_alerta'] = alerta if alerta else (None, None)
+            linhas.append(linha)
+        db.session.bulk_insert_mappings(CombustivelRegistro, linhas)
 
         db.session.commit()
 
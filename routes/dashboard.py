@@ -37,39 +37,32 @@ def index():
         'fechados': base_query.filter_by(status='fechado').count()
     }
 
-    # SLA Stats - Tickets Ativos (abertos/em andamento)
+    # SLA Stats - Tickets Ativos (abertos/em andamento), contados no banco por faixa
     now = agora_brasil()
-    tickets_ativos = base_query.filter(Ticket.status.in_(['aberto', 'em_andamento'])).all()
-
-    sla_ok = 0
-    sla_risco = 0
-    sla_violado = 0
-
-    for ticket in tickets_ativos:
-        if ticket.sla_resolucao_limite:
-            if now > ticket.sla_resolucao_limite:
-                sla_violado += 1
-            elif now > ticket.sla_resolucao_limite - timedelta(hours=2):
-                sla_risco += 1
-            else:
-                sla_ok += 1
-
-    stats['sla_ok'] = sla_ok
-    stats['sla_risco'] = sla_risco
-    stats['sla_violado'] = sla_violado
-
-    # SLA Histórico - Tickets Fechados
-    tickets_fechados = base_query.filter_by(status='fechado').all()
-
-    sla_hist_ok = 0
-    sla_hist_violado = 0
-
-    for ticket in tickets_fechados:
-        if ticket.sla_resolucao_limite and ticket.fechado_em:
-            if ticket.fechado_em <= ticket.sla_resolucao_limite:
-                sla_hist_ok += 1
-            else:
-                sla_hist_violado += 1
+    faixa = db.case(
+        (Ticket.sla_resolucao_limite < now, 'violado'),
+        (Ticket.sla_resolucao_limite < now + timedelta(hours=2), 'risco'),
+        else_='ok').label('faixa')
+    por_faixa = dict(base_query.filter(
+        Ticket.status.in_(['aberto', 'em_andamento']),
+        Ticket.sla_resolucao_limite.isnot(None)
+    ).with_entities(faixa, func.count(Ticket.id)).group_by(faixa).all())
+
+    stats['sla_ok'] = por_faixa.get('ok', 0)
+    stats['sla_risco'] = por_faixa.get('risco', 0)
+    stats['sla_violado'] = por_faixa.get('violado', 0)
+
+    # SLA Histórico - Tickets Fechados (mesmo CASE de Ticket.sla_resolucao_status)
+    _, status_resolucao = Ticket.expressoes_status_sla(now)
+    status_resolucao = status_resolucao.label('status_sla')
+    historico = dict(base_query.filter(
+        Ticket.status == 'fechado',
+        Ticket.sla_resolucao_limite.isnot(None),
+        Ticket.fechado_em.isnot(None)
+    ).with_entities(status_resolucao, func.count(Ticket.id)).group_by(status_resolucao).all())
+
+    sla_hist_ok = historico.get('ok', 0)
+    sla_hist_violado = historico.get('violado', 0)
 
     stats['sla_hist_ok'] = sla_hist_ok
     stats['sla_hist_violado'] = sla_hist_violado
@@ -240,18 +233,16 @@ def stats_top_atendentes():
 @dashboard_bp.route('/api/stats/sla')
 @login_required
 def stats_sla():
-    # Taxa de cumprimento de SLA
-    tickets_fechados = Ticket.query.filter(Ticket.fechado_em.isnot(None)).all()
-
-    dentro_sla = 0
-    fora_sla = 0
-
-    for ticket in tickets_fechados:
-        if ticket.sla_resolucao_limite and ticket.fechado_em:
-            if ticket.fechado_em <= ticket.sla_resolucao_limite:
-                dentro_sla += 1
-            else:
-                fora_sla += 1
+    # Taxa de cumprimento de SLA, contada no banco com o CASE de Ticket.sla_resolucao_status
+    _, status_resolucao = Ticket.expressoes_status_sla()
+    status_resolucao = status_resolucao.label('status_sla')
+    contagem = dict(db.session.query(status_resolucao, func.count(Ticket.id)).filter(
+        Ticket.fechado_em.isnot(None),
+        Ticket.sla_resolucao_limite.isnot(None)
+    ).group_by(status_resolucao).all())
+
+    dentro_sla = contagem.get('ok', 0)
+    fora_sla = contagem.get('violado', 0)
 
     return jsonify({
         'dentro_sla': dentro_sla,
@@ -16,7 +16,7 @@ def indicadores_required(f):
         if current_user.is_admin():
             return f(*args, **kwargs)
         categoria = Category.query.filter_by(nome='Indicadores Diretoria').first()
-        if not categoria or categoria not in current_user.categorias.all():
+        if not categoria or categoria not in current_user.categorias:
             flash('Acesso restrito ao módulo de indicadores.', 'danger')
             return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -53,8 +53,8 @@ def painel():
         mes_ref = date(agora_brasil().year, agora_brasil().month, 1)
 
     # Buscar categorias e indicadores ativos
-    categorias = IndicadorCategoria.query.filter_by(ativo=True)\
-        .order_by(IndicadorCategoria.ordem, IndicadorCategoria.nome).all()
+    categorias = IndicadorCategoria.query.options(db.selectinload(IndicadorCategoria.indicadores))\
+        .filter_by(ativo=True).order_by(IndicadorCategoria.ordem, IndicadorCategoria.nome).all()
 
     # Buscar registros do mês
     registros = IndicadorRegistro.query.filter_by(mes_referencia=mes_ref).all()
@@ -83,7 +83,7 @@ def painel():
 @indicadores_required
 @admin_required
 def gerenciar():
-    categorias = IndicadorCategoria.query\
+    categorias = IndicadorCategoria.query.options(db.selectinload(IndicadorCategoria.indicadores))\
         .order_by(IndicadorCategoria.ordem, IndicadorCategoria.nome).all()
     return render_template('indicadores/gerenciar.html', categorias=categorias)
 
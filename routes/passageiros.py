@@ -5,7 +5,7 @@ from flask import (Blueprint, render_template, redirect, url_for, flash,
 from flask_login import login_required, current_user
 from functools import wraps
 from werkzeug.utils import secure_filename
-from models import db, Cliente, ClienteTurno, PassageiroBase, Roteirizacao
+from models import db, Cliente, ClienteTurno, PassageiroBase, Roteirizacao, agora_brasil
 import roteirizador_utils as rutils
 
 passageiros_bp = Blueprint('passageiros', __name__, url_prefix='/passageiros')
@@ -15,8 +15,7 @@ def roteirizador_required(f):
     @wraps(f)
     def decorated_function(*args, **kwargs):
         if not current_user.is_admin():
-            cat = current_user.categorias.filter_by(nome='Roteirizador').first()
-            if not cat:
+            if not any(c.nome == 'Roteirizador' for c in current_user.categorias):
                 flash('Acesso restrito.', 'danger')
                 return redirect(url_for('index'))
         return f(*args, **kwargs)
@@ -248,42 +247,38 @@ def importar():
             for erro in result['erros'][:5]:
                 flash(f'Aviso: {erro}', 'warning')
 
-        count = 0
+        # Chaves de duplicidade (nome + endereço + numero) do cliente/turno lidas numa só
+        # consulta; novas linhas entram no conjunto para pegar repetições no próprio arquivo
+        existentes = {
+            (nome.lower(), endereco.lower(), numero)
+            for nome, endereco, numero in db.session.query(
+                PassageiroBase.nome,
+                db.func.coalesce(PassageiroBase.endereco, ''),
+                db.func.coalesce(PassageiroBase.numero, '')
+            ).filter(PassageiroBase.cliente_id == cliente_id, PassageiroBase.turno_id == turno_id)
+        }
+
+        novos = []
         duplicados = 0
+        agora = agora_brasil()  # um instante para todo o lote, em vez do default por linha
         for p_data in result['passageiros']:
-            nome = p_data.get('nome', '').strip()
-            endereco = p_data.get('endereco', '').strip()
-            numero = p_data.get('numero', '').strip()
+            dados = {campo: p_data.get(campo, '') for campo in rutils.CAMPOS_PASSAGEIRO}
+            for campo in ('nome', 'endereco', 'numero'):
+                dados[campo] = dados[campo].strip()
 
             # Verificar duplicidade por nome + endereço + numero + cliente + turno
-            if nome:
-                existente = PassageiroBase.query.filter(
-                    PassageiroBase.cliente_id == cliente_id,
-                    PassageiroBase.turno_id == turno_id,
-                    db.func.lower(PassageiroBase.nome) == nome.lower(),
-                    db.func.lower(db.func.coalesce(PassageiroBase.endereco, '')) == endereco.lower(),
-                    db.func.coalesce(PassageiroBase.numero, '') == numero
-                ).first()
-                if existente:
+            if dados['nome']:
+                chave = (dados['nome'].lower(), dados['endereco'].lower(), dados['numero'])
+                if chave in existentes:
                     duplicados += 1
                     continue
+                existentes.add(chave)
 
-            p = PassageiroBase(
-                cliente_id=cliente_id,
-                turno_id=turno_id,
-                nome=nome,
-                endereco=endereco,
-                numero=numero,
-                bairro=p_data.get('bairro', ''),
-                cidade=p_data.get('cidade', ''),
-                estado=p_data.get('estado', ''),
-                cep=p_data.get('cep', ''),
-                complemento=p_data.get('complemento', ''),
-                telefone=p_data.get('telefone', ''),
-                observacoes=p_data.get('observacoes', ''),
-            )
-            db.session.add(p)
-            count += 1
+            dados.update(cliente_id=cliente_id, turno_id=turno_id, criado_em=agora, atualizado_em=agora)
+            novos.append(dados)
+
+        db.session.bulk_insert_mappings(PassageiroBase, novos)
+        count = len(novos)
 
         db.session.commit()
 
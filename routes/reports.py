@@ -134,6 +134,8 @@ def gerar():
 
     return render_template('reports/index.html',
                           tickets=tickets,
+                          agora=agora_brasil(),
+                          tempos=Ticket.tempo_total_atendimento_em_lote([t.id for t in tickets]),
                           metricas=metricas,
                           atendentes=atendentes,
                           categorias=categorias,
@@ -256,7 +258,9 @@ def exportar_csv():
         'SLA Limite', 'SLA Status', 'Tempo Atendimento (min)'
     ])
 
-    # Dados
+    # Dados (um único "agora" para o status de SLA de todas as linhas)
+    agora = agora_brasil()
+    tempos = Ticket.tempo_total_atendimento_em_lote([t.id for t in tickets])
     for ticket in tickets:
         writer.writerow([
             ticket.id,
@@ -270,8 +274,8 @@ def exportar_csv():
             ticket.criado_em.strftime('%d/%m/%Y %H:%M') if ticket.criado_em else '',
             ticket.fechado_em.strftime('%d/%m/%Y %H:%M') if ticket.fechado_em else '',
             ticket.sla_resolucao_limite.strftime('%d/%m/%Y %H:%M') if ticket.sla_resolucao_limite else '',
-            ticket.sla_resolucao_status(),
-            ticket.tempo_total_atendimento()
+            ticket.sla_resolucao_status(agora),
+            tempos.get(ticket.id) or 0
         ])
 
     output.seek(0)
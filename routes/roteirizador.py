@@ -21,7 +21,7 @@ from werkzeug.utils import secure_filename
 
 from models import (
     db, Category, Roteirizacao, Passageiro, PontoParada, RoteiroPlanejado,
-    Cliente, TipoVeiculo, Simulacao, ClienteTurno, PassageiroBase
+    Cliente, TipoVeiculo, Simulacao, ClienteTurno, PassageiroBase, agora_brasil
 )
 import roteirizador_utils as rutils
 
@@ -39,7 +39,7 @@ def roteirizador_required(f):
         if current_user.is_admin():
             return f(*args, **kwargs)
         cat = Category.query.filter_by(nome='Roteirizador').first()
-        if cat and cat in current_user.categorias.all():
+        if cat and cat in current_user.categorias:
             return f(*args, **kwargs)
         flash('Acesso restrito ao módulo de roteirização.', 'danger')
         return redirect(url_for('index'))
@@ -249,24 +249,14 @@ def criar():
             db.session.add(rot)
             db.session.flush()  # para ter o ID
 
-            # Criar passageiros
-            count = 0
-            for p_data in result['passageiros']:
-                passageiro = Passageiro(
-                    roteirizacao_id=rot.id,
-                    nome=p_data.get('nome', ''),
-                    endereco=p_data.get('endereco', ''),
-                    numero=p_data.get('numero', ''),
-                    bairro=p_data.get('bairro', ''),
-                    cidade=p_data.get('cidade', ''),
-                    estado=p_data.get('estado', ''),
-                    cep=p_data.get('cep', ''),
-                    complemento=p_data.get('complemento', ''),
-                    telefone=p_data.get('telefone', ''),
-                    observacoes=p_data.get('observacoes', '')
-                )
-                db.session.add(passageiro)
-                count += 1
+            # Criar passageiros num único INSERT em lote, com um instante para todo o lote
+            agora = agora_brasil()
+            db.session.bulk_insert_mappings(Passageiro, [
+                dict({campo: p_data.get(campo, '') for campo in rutils.CAMPOS_PASSAGEIRO},
+                     roteirizacao_id=rot.id, criado_em=agora)
+                for p_data in result['passageiros']
+            ])
+            count = len(result['passageiros'])
 
             rot.total_passageiros = count
             db.session.commit()
@@ -438,19 +428,22 @@ def _geocodificar_background(app, rot_id, api_key, dados, inicio):
     with app.app_context():
         try:
             rutils.init_api_key(api_key)
-            total = len(dados)
             sucesso = 0
             falha = 0
 
-            for i, p_data in enumerate(dados, start=1):
+            def _progresso(i, total):
                 _atualizar_progresso(app, rot_id, {
                     'operacao': 'geocodificar', 'status': 'running',
                     'etapa': f'Geocodificando {i} de {total}...',
                     'percentual': int(90 * i / total), 'inicio': inicio
                 })
 
-                resultado = rutils.geocode_endereco(p_data['endereco_completo'])
-                p = Passageiro.query.get(p_data['id'])
+            # Requisições simultâneas (com limite de taxa); gravação no banco só nesta thread
+            resultados = rutils.geocode_lote(dados, progresso=_progresso)
+            passageiros = {p.id: p for p in Passageiro.query.filter(
+                Passageiro.id.in_([r['id'] for r in resultados]))}
+            for resultado in resultados:
+                p = passageiros.get(resultado['id'])
                 if p:
                     p.lat = resultado['lat']
                     p.lng = resultado['lng']
@@ -561,15 +554,19 @@ def _clusterizar_background(app, rot_id, api_key, inicio):
 
             clusters = rutils.clusterizar_passageiros(dados, rot.distancia_maxima_caminhada, rot.destino_lat, rot.destino_lng, departure_ts)
 
-            # Etapa 3: Criar paradas com reverse geocode
+            # Etapa 3: Criar paradas com reverse geocode (em lote, com cache por coordenada)
             total_clusters = len(clusters)
-            for i, cluster in enumerate(clusters, start=1):
+
+            def _progresso(i, total):
                 _atualizar_progresso(app, rot_id, {
                     'operacao': 'clusterizar', 'status': 'running',
-                    'etapa': f'Geocodificando parada {i} de {total_clusters}...',
-                    'percentual': 30 + int(60 * i / total_clusters), 'inicio': inicio
+                    'etapa': f'Geocodificando parada {i} de {total}...',
+                    'percentual': 30 + int(60 * i / total), 'inicio': inicio
                 })
-                endereco_ref = rutils.reverse_geocode(cluster['centroid_lat'], cluster['centroid_lng'])
+
+            enderecos_ref = rutils.reverse_geocode_lote(
+                [(c['centroid_lat'], c['centroid_lng']) for c in clusters], progresso=_progresso)
+            for i, (cluster, endereco_ref) in enumerate(zip(clusters, enderecos_ref), start=1):
                 parada = PontoParada(
                     roteirizacao_id=rot_id,
                     nome=f'Parada {i}',
@@ -94,6 +94,7 @@ def lista():
 
     return render_template('tickets/list.html',
                           tickets=tickets,
+                          agora=agora_brasil(),
                           atendentes=atendentes,
                           categorias=categorias)
 
@@ -102,8 +103,8 @@ def lista():
 @login_required
 def criar():
     # Filtrar categorias baseado no usuário
-    if current_user.is_cliente() and current_user.categorias.count() > 0:
-        categorias_permitidas = current_user.categorias.filter_by(ativo=True).all()
+    if current_user.is_cliente() and current_user.categorias:
+        categorias_permitidas = [c for c in current_user.categorias if c.ativo]
     else:
         categorias_permitidas = Category.query.filter_by(ativo=True).all()
 
@@ -127,8 +128,8 @@ def criar():
             return render_template('tickets/create.html', categorias=categorias_permitidas)
 
         # Validar se cliente pode usar esta categoria
-        if categoria_id and current_user.is_cliente() and current_user.categorias.count() > 0:
-            if not current_user.categorias.filter_by(id=categoria_id).first():
+        if categoria_id and current_user.is_cliente() and current_user.categorias:
+            if not any(c.id == categoria_id for c in current_user.categorias):
                 flash('Categoria não permitida.', 'danger')
                 return render_template('tickets/create.html', categorias=categorias_permitidas)
 
@@ -99,7 +99,8 @@ def lista():
 def criar():
     # Gestor só vê suas próprias categorias
     if current_user.is_gestor():
-        categorias = current_user.categorias.filter_by(ativo=True).order_by(Category.nome).all()
+        categorias = Category.query.with_parent(current_user, User.categorias).filter_by(
+            ativo=True).order_by(Category.nome).all()
     else:
         categorias = Category.query.filter_by(ativo=True).order_by(Category.nome).all()
     clientes = Cliente.query.filter_by(ativo=True).order_by(Cliente.nome).all()
@@ -195,7 +196,8 @@ def editar(id):
 
     # Gestor só vê suas próprias categorias
     if is_gestor:
-        categorias = current_user.categorias.filter_by(ativo=True).order_by(Category.nome).all()
+        categorias = Category.query.with_parent(current_user, User.categorias).filter_by(
+            ativo=True).order_by(Category.nome).all()
     else:
         categorias = Category.query.filter_by(ativo=True).order_by(Category.nome).all()
     clientes = Cliente.query.filter_by(ativo=True).order_by(Cliente.nome).all()
@@ -242,7 +244,7 @@ def editar(id):
                 gestor_cat_ids = set(current_user.get_categorias_ids())
                 categorias_ids_validas = [cid for cid in categorias_ids if cid in gestor_cat_ids]
                 # Categorias que o usuário tem mas não são do gestor (manter intocadas)
-                user_cat_ids_fora = [c.id for c in user.categorias.all() if c.id not in gestor_cat_ids]
+                user_cat_ids_fora = [c.id for c in user.categorias if c.id not in gestor_cat_ids]
                 user.categorias = []
                 for cat_id in categorias_ids_validas + user_cat_ids_fora:
                     categoria = Category.query.get(cat_id)
@@ -0,0 +1,61 @@
+"""
+Alertas de hodômetro entre abastecimentos consecutivos do mesmo veículo,
+avaliados em ordem cronológica mesmo quando o arquivo vem fora de ordem.
+"""
+from datetime import date
+
+from combustivel_utils import RegistroCombustivel, analisar_combustivel
+
+
+def _registro(prefixo, dia, hora, hodo_inicio, hodo_fim, modelo='001-ONIBUS'):
+    km = hodo_fim - hodo_inicio
+    return RegistroCombustivel(
+        prefixo=prefixo, data=date(2024, 3, dia), hora=hora, tipo='D', tanque=1, bomba=1,
+        litros=100.0, hodometro_inicio=hodo_inicio, hodometro_fim=hodo_fim, km=km,
+        km_acumulado=km, kml=km / 100.0, flag='', garagem='001', modelo=modelo,
+    )
+
+
+def _inconsistencias(resultado):
+    """{(prefixo, data, hora): descrição} dos alertas HODOMETRO_INCONSISTENTE"""
+    return {
+        (a['registro'].prefixo, a['registro'].data, a['registro'].hora): p['descricao']
+        for a in resultado['alertas'] for p in a['problemas']
+        if p['tipo'] == 'HODOMETRO_INCONSISTENTE'
+    }
+
+
+def test_hodometro_inconsistente_usa_ordem_cronologica():
+    # Veículo 1: sequência contínua (10:00 antes de 18:00 no dia 1), mas fora de ordem no arquivo
+    # Veículo 2: o abastecimento das 09:00 do dia 2 começa antes do fim do anterior
+    registros = [
+        _registro('0000001', 2, '07:00', 1500, 1800),
+        _registro('0000002', 2, '09:00', 2250, 2500),
+        _registro('0000001', 1, '18:00', 1200, 1500),
+        _registro('0000002', 1, '08:00', 2000, 2300),
+        _registro('0000001', 1, '10:00', 1000, 1200),
+    ]
+
+    inconsistencias = _inconsistencias(analisar_combustivel(registros))
+
+    assert inconsistencias == {
+        ('0000002', date(2024, 3, 2), '09:00'):
+            'Hodômetro inicial (2250) menor que o final do abast. anterior (2300)',
+    }
+
+
+def test_ordem_do_arquivo_nao_muda_os_alertas():
+    registros = [
+        _registro('0000001', 1, '10:00', 1000, 1200),
+        _registro('0000001', 1, '18:00', 1150, 1500),
+        _registro('0000001', 2, '07:00', 1500, 1800),
+        _registro('0000003', 1, '06:00', 500, 900),
+        _registro('0000003', 1, '06:30', 850, 1000),
+    ]
+    embaralhados = [registros[i] for i in (4, 2, 0, 3, 1)]
+
+    esperado = _inconsistencias(analisar_combustivel(registros))
+
+    assert set(esperado) == {('0000001', date(2024, 3, 1), '18:00'),
+                             ('0000003', date(2024, 3, 1), '06:30')}
+    assert _inconsistencias(analisar_combustivel(embaralhados)) == esperado
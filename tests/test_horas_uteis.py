@@ -0,0 +1,117 @@
+"""
+Horas úteis (08:00-17:00, seg-sex) calculadas em forma fechada, comparadas com
+a soma dia a dia do expediente.
+"""
+import random
+from datetime import datetime, timedelta
+
+import pytest
+
+from models import (HORA_FIM, HORA_INICIO, adicionar_horas_uteis, calcular_horas_uteis_entre,
+                    proximo_inicio_expediente)
+
+
+def _horas_uteis_dia_a_dia(inicio, fim):
+    """Referência: soma, dia a dia, a parte de cada expediente entre inicio e fim"""
+    if fim < inicio:
+        return -_horas_uteis_dia_a_dia(fim, inicio)
+    total = timedelta()
+    dia = inicio.date()
+    while dia <= fim.date():
+        if dia.weekday() < 5:
+            de = max(inicio, datetime.combine(dia, HORA_INICIO))
+            ate = min(fim, datetime.combine(dia, HORA_FIM))
+            if ate > de:
+                total += ate - de
+        dia += timedelta(days=1)
+    return total / timedelta(hours=1)
+
+
+def _instante_aleatorio(rng):
+    return datetime(2024, 1, 1) + timedelta(seconds=rng.randrange(120 * 86400),
+                                            microseconds=rng.randrange(10**6))
+
+
+def test_horas_uteis_entre_igual_a_soma_dia_a_dia():
+    rng = random.Random(42)
+    for _ in range(2000):
+        inicio = _instante_aleatorio(rng)
+        fim = _instante_aleatorio(rng)
+        assert calcular_horas_uteis_entre(inicio, fim) == pytest.approx(
+            _horas_uteis_dia_a_dia(inicio, fim), abs=1e-9)
+
+
+@pytest.mark.parametrize('inicio, fim, horas', [
+    # Mesmo dia, dentro do expediente
+    (datetime(2024, 3, 4, 9, 0), datetime(2024, 3, 4, 11, 30), 2.5),
+    # Sexta 16:00 -> segunda 09:00: 1h na sexta + 1h na segunda
+    (datetime(2024, 3, 8, 16, 0), datetime(2024, 3, 11, 9, 0), 2.0),
+    # Fim de semana inteiro não conta
+    (datetime(2024, 3, 9, 10, 0), datetime(2024, 3, 10, 15, 0), 0.0),
+    # Antes e depois do expediente: o dia inteiro
+    (datetime(2024, 3, 5, 6, 0), datetime(2024, 3, 5, 20, 0), 9.0),
+    # Prazo vencido: negativo
+    (datetime(2024, 3, 5, 12, 0), datetime(2024, 3, 5, 10, 0), -2.0),
+])
+def test_horas_uteis_entre_casos_conhecidos(inicio, fim, horas):
+    assert calcular_horas_uteis_entre(inicio, fim) == pytest.approx(horas)
+
+
+@pytest.mark.parametrize('instante', [
+    datetime(2024, 3, 5, 10, 15),   # dentro do expediente
+    datetime(2024, 3, 5, 20, 0),    # fora do expediente
+    datetime(2024, 3, 9, 12, 0),    # sábado
+])
+def test_horas_uteis_entre_pontas_iguais(instante):
+    # A versão anterior entrava em recursão infinita com dt_inicio == dt_fim
+    assert calcular_horas_uteis_entre(instante, instante) == 0
+
+
+def _adicionar_horas_dia_a_dia(dt, horas):
+    """Referência: consome o expediente dia a dia até esgotar as horas"""
+    restante = timedelta(hours=horas)
+    while True:
+        if dt.weekday() >= 5 or dt.time() >= HORA_FIM:
+            dt = datetime.combine(dt.date() + timedelta(days=1), HORA_INICIO)
+            continue
+        dt = max(dt, datetime.combine(dt.date(), HORA_INICIO))
+        disponivel = datetime.combine(dt.date(), HORA_FIM) - dt
+        if restante <= disponivel:
+            return dt + restante
+        restante -= disponivel
+        dt = datetime.combine(dt.date(), HORA_FIM)
+
+
+def test_adicionar_horas_uteis_igual_ao_consumo_dia_a_dia():
+    rng = random.Random(7)
+    for _ in range(2000):
+        inicio = _instante_aleatorio(rng)
+        horas = rng.choice((1, 4, 8, 9, 24, 48, 100)) if rng.random() < 0.5 else rng.uniform(0.01, 80)
+        resultado = adicionar_horas_uteis(inicio, horas)
+        assert abs(resultado - _adicionar_horas_dia_a_dia(inicio, horas)) <= timedelta(microseconds=1)
+        # Ida e volta: as horas úteis entre o início e o prazo são as somadas
+        assert calcular_horas_uteis_entre(inicio, resultado) == pytest.approx(horas, abs=1e-6)
+
+
+@pytest.mark.parametrize('inicio, horas, esperado', [
+    # Termina exatamente no fim do expediente: 17:00 do mesmo dia, não 08:00 do seguinte
+    (datetime(2024, 3, 4, 8, 0), 9, datetime(2024, 3, 4, 17, 0)),
+    # Sexta 15:00 + 4h: 2h na sexta, 2h na segunda
+    (datetime(2024, 3, 8, 15, 0), 4, datetime(2024, 3, 11, 10, 0)),
+    # Sábado: conta a partir de segunda 08:00
+    (datetime(2024, 3, 9, 13, 0), 1, datetime(2024, 3, 11, 9, 0)),
+    # Depois do expediente: conta a partir de 08:00 do dia útil seguinte
+    (datetime(2024, 3, 5, 18, 30), 2, datetime(2024, 3, 6, 10, 0)),
+    # Sem horas: devolve o próprio instante
+    (datetime(2024, 3, 9, 13, 0), 0, datetime(2024, 3, 9, 13, 0)),
+])
+def test_adicionar_horas_uteis_casos_conhecidos(inicio, horas, esperado):
+    assert adicionar_horas_uteis(inicio, horas) == esperado
+
+
+@pytest.mark.parametrize('dia, esperado', [
+    (4, 4), (5, 5), (6, 6), (7, 7), (8, 8),  # segunda a sexta: o próprio dia
+    (9, 11), (10, 11),                       # sábado e domingo: segunda-feira
+])
+def test_proximo_inicio_expediente(dia, esperado):
+    assert proximo_inicio_expediente(datetime(2024, 3, dia, 19, 45, 12, 345)) == datetime(2024, 3, esperado, 8, 0)
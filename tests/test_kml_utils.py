@@ -0,0 +1,111 @@
+"""
+Equivalência da comparação de KML otimizada (grade, varredura por latitude,
+parada antecipada) com o cálculo direto par a par, e leitura de timestamps.
+"""
+import random
+from datetime import datetime
+
+import pytest
+
+import kml_utils
+from kml_utils import (_parse_timestamp, calcular_distancia_total, comparar_kml, extrair_coordenadas_kml,
+                       extrair_tempo_trajeto, haversine, validar_kml)
+
+
+def _gravar_kml(caminho, coords):
+    texto = ' '.join(f'{lon},{lat},0' for lat, lon in coords)
+    caminho.write_text(
+        '<?xml version="1.0" encoding="UTF-8"?>'
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document><Placemark>'
+        f'<LineString><coordinates>{texto}</coordinates></LineString>'
+        '</Placemark></Document></kml>', encoding='utf-8')
+    return str(caminho)
+
+
+def _trajeto(rng, n, lat, lon, passo=0.0008):
+    coords = []
+    for _ in range(n):
+        lat += rng.uniform(-passo, passo)
+        lon += rng.uniform(-passo, passo)
+        coords.append((round(lat, 6), round(lon, 6)))
+        # GPS parado: pontos repetidos em sequência
+        if rng.random() < 0.1:
+            coords.append(coords[-1])
+    return coords
+
+
+def _comparar_direto(planejado, executado, tolerancia):
+    """Mesmas métricas de comparar_kml, com o mínimo calculado contra todos os pontos"""
+    distancias = [min(haversine(lat, lon, la, lo) for la, lo in planejado) for lat, lon in executado]
+    fora = sum(d > tolerancia for d in distancias)
+    cobertos = sum(any(haversine(lat, lon, la, lo) <= tolerancia for la, lo in executado)
+                   for lat, lon in planejado)
+    aderencia = min((len(executado) - fora) / len(executado), cobertos / len(planejado))
+    return {
+        'km_planejado': round(calcular_distancia_total(planejado), 2),
+        'km_percorrido': round(calcular_distancia_total(executado), 2),
+        'desvio_maximo_metros': round(max(distancias), 2),
+        'aderencia_percentual': round(aderencia * 100, 2),
+        'pontos_fora_rota': fora,
+    }
+
+
+@pytest.mark.parametrize('semente, tolerancia', [(1, 100), (2, 30), (3, 500), (4, 0)])
+def test_comparar_kml_igual_ao_calculo_direto(tmp_path, semente, tolerancia):
+    rng = random.Random(semente)
+    planejado = _trajeto(rng, 300, -23.55, -46.63)
+    # Executado segue o planejado com ruído e depois se afasta da rota
+    executado = [(round(lat + rng.uniform(-0.0005, 0.0005), 6), round(lon + rng.uniform(-0.0005, 0.0005), 6))
+                 for lat, lon in planejado[::2]] + _trajeto(rng, 80, -23.50, -46.60)
+
+    resultado = comparar_kml(_gravar_kml(tmp_path / 'plan.kml', planejado),
+                             _gravar_kml(tmp_path / 'exec.kml', executado), tolerancia)
+
+    assert resultado == _comparar_direto(planejado, executado, tolerancia)
+
+
+def test_comparar_kml_perto_do_antimeridiano(tmp_path):
+    # Longitudes perto de 180: a grade não se aplica e a varredura por latitude assume
+    rng = random.Random(5)
+    # (pontos com longitude acima de 180 são descartados na leitura do KML)
+    planejado = [p for p in _trajeto(rng, 150, -17.0, 179.99, passo=0.002) if p[1] <= 180]
+    executado = [p for p in _trajeto(rng, 150, -17.0, 179.99, passo=0.002) if p[1] <= 180]
+
+    resultado = comparar_kml(_gravar_kml(tmp_path / 'plan.kml', planejado),
+                             _gravar_kml(tmp_path / 'exec.kml', executado), 200)
+
+    assert resultado == _comparar_direto(planejado, executado, 200)
+
+
+@pytest.mark.parametrize('texto', [
+    '2024-01-01T10:00:00+0300',
+    '2024-01-01T10:00:00+03',
+    '2024-01-01T10:00:00-03:00',
+    '2024-01-01T10:00:00Z',
+    '2024-01-01T10:00:00',
+])
+def test_parse_timestamp_sempre_sem_fuso(texto):
+    assert _parse_timestamp(texto) == datetime(2024, 1, 1, 10, 0)
+
+
+def test_tempo_trajeto_com_offsets_em_formatos_diferentes(tmp_path):
+    caminho = tmp_path / 'tempo.kml'
+    caminho.write_text(
+        '<kml xmlns="http://www.opengis.net/kml/2.2"><Document>'
+        '<Placemark><TimeStamp><when>2024-01-01T10:00:00+0300</when></TimeStamp></Placemark>'
+        '<Placemark><TimeStamp><when>2024-01-01T11:30:00</when></TimeStamp></Placemark>'
+        '</Document></kml>', encoding='utf-8')
+
+    assert extrair_tempo_trajeto(str(caminho)) == 90
+
+
+def test_timestamp_com_erro_nao_descarta_coordenadas(tmp_path, monkeypatch):
+    def falhar(content):
+        raise TypeError("can't compare offset-naive and offset-aware datetimes")
+
+    monkeypatch.setattr(kml_utils, '_extrair_tempo_do_conteudo', falhar)
+    caminho = _gravar_kml(tmp_path / 'pontos.kml', [(-23.5, -46.6), (-23.51, -46.61)])
+
+    assert extrair_coordenadas_kml(caminho) == [(-23.5, -46.6), (-23.51, -46.61)]
+    assert validar_kml(caminho) == (True, 'Arquivo válido com 2 pontos')
+    assert extrair_tempo_trajeto(caminho) is None